@@ -0,0 +1,66 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.permissions import SAFE_METHODS
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_read_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_READ_THREADS,
+                thread_name_prefix='async-read',
+            )
+    return _executor
+
+
+def run_read_view(view, request, *args, **kwargs):
+    """Выполняет синхронное представление в потоке пула чтения.
+
+    У каждого потока своё соединение с базой, поэтому устаревшие
+    соединения закрываются здесь, а не сигналами запроса в потоке
+    обработчика ASGI.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+class AsyncReadMixin:
+    """Делает представление вьюсета асинхронным в режиме ASGI.
+
+    В Django 3.2 все синхронные представления под ASGI выполняются
+    в одном потоке на процесс. Безопасные запросы здесь уходят в пул
+    ASYNC_READ_THREADS и идут параллельно, а изменяющие выполняются
+    в общем потоке, как и без обёртки.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_READ_VIEWS:
+            return view
+
+        async def async_view(request, *args, **kwargs):
+            if request.method in SAFE_METHODS:
+                return await sync_to_async(
+                    run_read_view,
+                    thread_sensitive=False,
+                    executor=get_read_executor(),
+                )(view, request, *args, **kwargs)
+            return await sync_to_async(view)(request, *args, **kwargs)
+
+        return functools.wraps(view)(async_view)
@@ -1,14 +1,23 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
-from recipes.models import Recipe, Tag, Ingredient
-
-
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
+from favorite.models import Favorite
+from shoppingcart.models import ShoppingCart
+
+RECIPE_ORDERINGS = {
+    'newest': ('-date', '-id'),
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+    'cooking_time': ('cooking_time', 'id'),
+}
+
+
+def filter_by_user(queryset, model, user):
+    """Оставляет рецепты, связанные с пользователем через model."""
+    return queryset.filter(
+        Exists(model.objects.filter(user=user, recipe=OuterRef('pk')))
+    )
 
 
 class RecipesFilterSet(FilterSet):
@@ -19,6 +28,11 @@ class RecipesFilterSet(FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
@@ -26,10 +40,18 @@ class RecipesFilterSet(FilterSet):
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorite__user=self.request.user)
+            return filter_by_user(queryset, Favorite, self.request.user)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shoppingcart__user=self.request.user)
+            return filter_by_user(queryset, ShoppingCart, self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
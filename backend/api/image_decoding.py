@@ -0,0 +1,96 @@
+import base64
+import binascii
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+DECODE_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+class ImageDecodingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервер занят обработкой картинок, повторите позже.'
+    default_code = 'image_decoding_busy'
+
+
+def get_pool():
+    """Пул декодирования и семафор на работающие и ожидающие задачи."""
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = settings.RECIPE_IMAGE_DECODE_WORKERS
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='image-decoding')
+            _slots = threading.BoundedSemaphore(
+                workers + settings.RECIPE_IMAGE_DECODE_QUEUE_SIZE)
+    return _executor, _slots
+
+
+def check_image_size(image):
+    width, height = image.size
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise ValidationError('Слишком большое разрешение картинки')
+
+
+def decode(data):
+    """Декодирует base64 по частям во временный файл и проверяет картинку.
+
+    Декодированные байты не держатся в памяти целиком: файл уходит
+    на диск после SPOOL_MAX_SIZE. Размер проверяется по заголовку
+    до разбора пикселей.
+    """
+    file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        for start in range(0, len(data), DECODE_CHUNK_SIZE):
+            file.write(base64.b64decode(
+                data[start:start + DECODE_CHUNK_SIZE], validate=True))
+        file.seek(0)
+        image = Image.open(file)
+        check_image_size(image)
+        image.verify()
+    except (binascii.Error, ValueError, OSError):
+        file.close()
+        raise ValidationError('Загрузите корректную картинку')
+    except Image.DecompressionBombError:
+        file.close()
+        raise ValidationError('Слишком большое разрешение картинки')
+    except ValidationError:
+        file.close()
+        raise
+    file.seek(0)
+    decoded = File(file, name=f'temp.{image.format.lower()}')
+    decoded.image = image
+    decoded.content_type = Image.MIME.get(image.format)
+    return decoded
+
+
+def decode_base64_image(data):
+    """Картинка из data URL, декодированная в ограниченном пуле.
+
+    Слишком большие данные отклоняются до декодирования, а если пул
+    и очередь заняты дольше RECIPE_IMAGE_DECODE_TIMEOUT, запрос
+    получает 503 вместо бесконечного ожидания.
+    """
+    _, _, data = data.partition(';base64,')
+    if len(data) * 3 // 4 > settings.RECIPE_IMAGE_MAX_DECODED_SIZE:
+        raise ValidationError('Слишком большой размер картинки')
+    if not settings.RECIPE_IMAGE_DECODE_WORKERS:
+        return decode(data)
+    executor, slots = get_pool()
+    if not slots.acquire(timeout=settings.RECIPE_IMAGE_DECODE_TIMEOUT):
+        raise ImageDecodingBusy()
+    try:
+        return executor.submit(decode, data).result()
+    finally:
+        slots.release()
@@ -1,5 +1,175 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.models import Recipe
+from timeline.feed import read_timeline
+
+CURSOR_VALUE_TYPES = (str, int, float)
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу сортировки вместо OFFSET.
+
+    Курсор хранит значения полей сортировки последнего объекта страницы,
+    поэтому следующая страница выбирается условием по индексу и стоит
+    столько же, сколько первая. Общее количество считается только
+    по запросу параметром count.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+    ordering = ('-date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, ordering=None, page_size=None):
+        if ordering is not None:
+            self.ordering = ordering
+        self.page_size = page_size
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def decode_cursor(self, request, model):
+        """Позиция из курсора, приведённая к типам полей сортировки.
+
+        На любой испорченный курсор отвечает 404, а не ошибкой
+        при построении запроса.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError, binascii.Error, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+                len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        if not all(isinstance(value, CURSOR_VALUE_TYPES)
+                   and not isinstance(value, bool) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        cursor = json.dumps(position)
+        return urlsafe_b64encode(cursor.encode()).decode()
+
+    def get_position(self, obj):
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def get_position_filter(self, position):
+        """Условие «строго после position» для составного ключа."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.count = None
+        if request.query_params.get(self.count_query_param) in (
+                'true', '1'):
+            self.count = queryset.count()
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+        results = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_position = self.get_position(results[-1])
+        return results
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+
+class TimelinePagination(KeysetPagination):
+    """Курсорная пагинация ленты подписок.
+
+    Страницу собирает read_timeline из входящих и рецептов популярных
+    авторов, курсор хранит дату и id последнего рецепта.
+    """
+
+    def paginate_timeline(self, user, request):
+        self.request = request
+        self.count = None
+        page_size = self.get_page_size(request)
+        entries = read_timeline(
+            user, page_size + 1, self.decode_cursor(request, Recipe))
+        self.next_position = None
+        if len(entries) > page_size:
+            entries = entries[:page_size]
+            date, recipe_id = entries[-1]
+            self.next_position = [date.isoformat(), recipe_id]
+        return [recipe_id for _, recipe_id in entries]
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная пагинация с переходом на курсорную по параметру cursor.
+
+    Порядок для курсора задаётся атрибутом cursor_ordering у view.
+    Если он None, порядок нельзя выразить курсором (например,
+    по релевантности поиска), и cursor не учитывается.
+    """
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        ordering = getattr(view, 'cursor_ordering', KeysetPagination.ordering)
+        if (self.cursor_query_param in request.query_params
+                and ordering is not None):
+            self.keyset = KeysetPagination(
+                ordering=ordering, page_size=self.page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
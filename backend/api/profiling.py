@@ -0,0 +1,179 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+DUPLICATE_QUERY_THRESHOLD = 3
+
+logger = logging.getLogger(__name__)
+current_profile = contextvars.ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Замеры одного запроса: SQL, сериализация и общее время.
+
+    Профиль хранится в contextvar, который asgiref копирует в потоки
+    sync_to_async, поэтому запросы к базе учитываются и в режиме ASGI.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = Counter()
+        self.sql_time = 0
+        self.serializer_time = 0
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def get_duplicates(self):
+        return {
+            sql: count for sql, count in self.queries.most_common()
+            if count >= DUPLICATE_QUERY_THRESHOLD
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_time += time.perf_counter() - started
+        profile.queries[sql] += 1
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+_profiled_classes = {}
+
+
+def get_profiled_class(serializer_class):
+    """Подкласс сериализатора, который учитывает время своего data."""
+    profiled = _profiled_classes.get(serializer_class)
+    if profiled is None:
+        data = serializer_class.data
+
+        def profiled_data(self):
+            profile = current_profile.get()
+            started = time.perf_counter()
+            try:
+                return data.fget(self)
+            finally:
+                if profile is not None:
+                    profile.serializer_time += (
+                        time.perf_counter() - started)
+
+        profiled = type(serializer_class.__name__, (serializer_class,), {
+            'data': property(profiled_data),
+            '__module__': serializer_class.__module__,
+        })
+        _profiled_classes[serializer_class] = profiled
+    return profiled
+
+
+def profile_serializer(serializer):
+    """Учитывает время serializer.data в профиле текущего запроса.
+
+    Класс меняется только у сериализаторов профилируемых запросов,
+    остальные и сам BaseSerializer не затрагиваются.
+    """
+    if current_profile.get() is not None:
+        serializer.__class__ = get_profiled_class(type(serializer))
+    return serializer
+
+
+class ProfiledSerializerMixin:
+    """Профилирует сериализаторы, созданные через get_serializer."""
+
+    def get_serializer(self, *args, **kwargs):
+        return profile_serializer(super().get_serializer(*args, **kwargs))
+
+
+def report(request, response, profile):
+    total = time.perf_counter() - profile.started
+    duplicates = profile.get_duplicates()
+    match = request.resolver_match
+    entry = {
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 2),
+        'sql_ms': round(profile.sql_time * 1000, 2),
+        'queries': profile.query_count,
+        'serializer_ms': round(profile.serializer_time * 1000, 2),
+        'response_bytes': (
+            None if response.streaming else len(response.content)),
+        'duplicate_queries': sum(duplicates.values()),
+    }
+    if duplicates:
+        sql, count = next(iter(duplicates.items()))
+        entry['n_plus_one'] = {
+            'fingerprint': hashlib.md5(sql.encode()).hexdigest()[:12],
+            'count': count,
+            'sql': sql[:200],
+        }
+    response['Server-Timing'] = ', '.join((
+        f'db;dur={entry["sql_ms"]};desc="{entry["queries"]} queries"',
+        f'serializer;dur={entry["serializer_ms"]}',
+        f'total;dur={entry["total_ms"]}',
+    ))
+    logger.info(json.dumps(entry, ensure_ascii=False))
+
+
+@sync_and_async_middleware
+def request_profiling_middleware(get_response):
+    """Профилирует долю REQUEST_PROFILING_SAMPLE_RATE запросов.
+
+    Добавляет заголовок Server-Timing и пишет строку JSON в лог
+    api.profiling. При нулевой доле middleware отключается целиком.
+    """
+    sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+    if not sample_rate:
+        raise MiddlewareNotUsed
+    connection_created.connect(install_query_recorder)
+    for connection in connections.all():
+        install_query_recorder(connection=connection)
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            if random.random() >= sample_rate:
+                return await get_response(request)
+            profile = RequestProfile()
+            token = current_profile.set(profile)
+            try:
+                response = await get_response(request)
+            finally:
+                current_profile.reset(token)
+            report(request, response, profile)
+            return response
+    else:
+        def middleware(request):
+            if random.random() >= sample_rate:
+                return get_response(request)
+            profile = RequestProfile()
+            token = current_profile.set(profile)
+            try:
+                response = get_response(request)
+            finally:
+                current_profile.reset(token)
+            report(request, response, profile)
+            return response
+
+    return middleware
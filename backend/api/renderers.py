@@ -0,0 +1,73 @@
+import csv
+import json
+
+from rest_framework import renderers
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Файл отдаётся по частям через stream(), а render() нужен DRF только
+    для ответов с ошибками, например при отсутствии авторизации.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode(self.charset)
+
+    def stream(self, ingredients):
+        raise NotImplementedError
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        for item in ingredients:
+            yield f' {item["name"]}- {item["total"]}- {item["unit"]}\n'
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку вместо хранения."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+        for item in ingredients:
+            yield writer.writerow(
+                (item['name'], item['total'], item['unit'])
+            )
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return renderers.JSONRenderer().render(data)
+
+    def stream(self, ingredients):
+        separator = ''
+        yield '['
+        for item in ingredients:
+            yield separator + json.dumps(
+                {
+                    'name': item['name'],
+                    'amount': item['total'],
+                    'measurement_unit': item['unit'],
+                },
+                ensure_ascii=False,
+            )
+            separator = ','
+        yield ']'
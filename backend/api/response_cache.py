@@ -0,0 +1,139 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from foodgram.caches import is_shared
+
+CATALOG = 'catalog'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+ALL_RECIPES = 'recipes'
+TRENDING = 'trending'
+CACHEABLE_PARAMS = {'tags', 'author', 'page', 'limit', 'ordering'}
+STATS_KEYS = {'hits': 'recipe_list_cache:hits',
+              'misses': 'recipe_list_cache:misses'}
+
+
+def get_cache():
+    return caches[settings.RECIPE_LIST_CACHE]
+
+
+def is_enabled():
+    """Кешировать ответы можно, только если кеш общий для процессов.
+
+    Иначе версии, изменённые одним воркером, не увидят остальные,
+    и они будут отдавать устаревшие ответы до истечения таймаута.
+    """
+    return is_shared(settings.RECIPE_LIST_CACHE)
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def tag_scope(slug):
+    return f'tag:{slug}'
+
+
+def recipe_scope(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def get_version_key(scope):
+    return f'response_version:{scope}'
+
+
+def get_versions(scopes):
+    """Текущие версии scopes в том же порядке.
+
+    Отсутствующая версия начинается с текущего времени, а не с нуля,
+    чтобы после вытеснения ключа из кеша не совпасть со старой.
+    """
+    cache = get_cache()
+    keys = [get_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*scopes):
+    """Делает устаревшими ответы, зависящие от scopes.
+
+    Версии меняются после фиксации транзакции, чтобы параллельный запрос
+    не успел закешировать ещё не зафиксированные данные с новой версией.
+    """
+    def bump():
+        cache = get_cache()
+        for scope in set(scopes):
+            try:
+                cache.incr(get_version_key(scope))
+            except ValueError:
+                cache.add(get_version_key(scope), time.time_ns(),
+                          timeout=None)
+
+    if is_enabled():
+        transaction.on_commit(bump)
+
+
+def get_cache_key(request):
+    """Ключ кеша для анонимного списка рецептов или None.
+
+    Ключ включает версии автора и тегов из фильтра, а без фильтров -
+    общую версию рецептов, поэтому изменение рецепта делает устаревшими
+    только зависящие от него страницы. Подписки и избранное меняют
+    только версии автора и рецепта: счётчики в общих списках и списках
+    по тегам обновляются по истечении RECIPE_LIST_CACHE_TIMEOUT.
+    """
+    params = request.query_params
+    if (not is_enabled() or request.user.is_authenticated
+            or not set(params) <= CACHEABLE_PARAMS):
+        return None
+    author = params.get('author')
+    if author is not None and not author.isdigit():
+        return None
+    tags = sorted(set(params.getlist('tags')))
+    scopes = [CATALOG]
+    if author is not None:
+        scopes.append(author_scope(author))
+    scopes.extend(tag_scope(slug) for slug in tags)
+    if author is None and not tags:
+        scopes.append(ALL_RECIPES)
+    if params.get('ordering') == 'trending':
+        scopes.append(TRENDING)
+    normalized = (
+        request.accepted_renderer.format,
+        ','.join(tags),
+        author or '',
+        params.get('page', '1'),
+        params.get('limit', ''),
+        params.get('ordering', ''),
+        ','.join(
+            f'{scope}={version}'
+            for scope, version in zip(scopes, get_versions(scopes))
+        ),
+    )
+    digest = hashlib.md5('|'.join(normalized).encode()).hexdigest()
+    return f'recipe_list:{digest}'
+
+
+def record(hit):
+    cache = get_cache()
+    key = STATS_KEYS['hits' if hit else 'misses']
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_stats():
+    cache = get_cache()
+    stats = {name: cache.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0
+    return stats
@@ -1,31 +1,58 @@
-import base64
-
-from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer
 from django.contrib.auth.password_validation import validate_password
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
-from rest_framework.serializers import ModelSerializer, PrimaryKeyRelatedField
+from rest_framework.serializers import ModelSerializer
 from rest_framework import status
 
-from users.models import CustomUser, FollowUser
+from users.models import CustomUser
 from tag.models import Tag
 from ingredients.models import Ingredient
+from recipes.counters import change_counter
+from recipes.images import build_thumbnail_urls
 from recipes.models import Recipe, RecipeIngredients
-from favorite.models import Favorite
-from shoppingcart.models import ShoppingCart
+from recipes.search import update_search_vector
+from shoppingcart.models import ShoppingCartIngredient
+from timeline.feed import push_recipe
+
+from .image_decoding import check_image_size, decode_base64_image
+from .user_state import (
+    FAVORITES, SHOPPING_CART, SUBSCRIPTIONS, get_user_state,
+)
+
+
+def get_recipes_limit(request):
+    """Возвращает лимит рецептов автора из параметра recipes_limit."""
+    try:
+        limit = int(request.GET.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
 
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            return serializers.FileField.to_internal_value(
+                self, decode_base64_image(data))
+
+        image = super().to_internal_value(data)
+        check_image_size(image.image)
+        return image
 
-        return super().to_internal_value(data)
+
+class ThumbnailsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии картинки по размерам и форматам.
+
+    Пока копии не готовы, поле пустое и клиент показывает оригинал.
+    """
+
+    def to_representation(self, value):
+        return build_thumbnail_urls(value, self.context.get('request'))
 
 
 class CustomUserSerializer(UserSerializer):
@@ -40,14 +67,12 @@ class CustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
+            'followers_count',
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        user = request.user
-        return FollowUser.objects.filter(user=user, author=obj).exists()
+        state = get_user_state(self.context.get('request'))
+        return state is not None and state.contains(SUBSCRIPTIONS, obj.id)
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -85,7 +110,6 @@ class ChangePasswordSerializer(serializers.Serializer):
 class SubscriptionsSerializer(CustomUserSerializer):
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta(CustomUserSerializer.Meta):
         fields = CustomUserSerializer.Meta.fields + ('recipes',
@@ -110,27 +134,18 @@ class SubscriptionsSerializer(CustomUserSerializer):
         return data
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        if limit:
-            try:
-                limit = int(limit)
-            except ValueError:
-                limit = None
-        recipes = Recipe.objects.filter(author=obj)
-        if limit:
-            recipes = recipes[:int(limit)]
-        serializer = RecipeSerializer(recipes,
-                                      many=True,
-                                      read_only=True,
-                                      context={
-                                          'request': request
-                                      })
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            recipes = Recipe.objects.filter(author=obj)
+            limit = get_recipes_limit(self.context.get('request'))
+            if limit:
+                recipes = recipes[:limit]
+        serializer = ShortRecipeSerializer(recipes,
+                                           many=True,
+                                           read_only=True,
+                                           context=self.context)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -146,7 +161,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField(source='ingredient_id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
@@ -157,16 +172,12 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'amount', 'measurement_unit')
         read_only_fields = ('name', 'measurement_unit')
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        data['id'] = instance.ingredient.id
-        return data
-
 
 class RecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     image = Base64ImageField(required=False, allow_null=True)
+    thumbnails = ThumbnailsField()
     ingredients = IngredientRecipeSerializer(
         source='recipeingredients', many=True
     )
@@ -182,25 +193,21 @@ class RecipeSerializer(serializers.ModelSerializer):
             'tags',
             'text',
             'image',
+            'thumbnails',
             'ingredients',
             'cooking_time',
+            'favorites_count',
             'is_favorited',
             'is_in_shopping_cart',
         )
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return Favorite.objects.filter(user_id=user.id,
-                                           recipe=obj).exists()
-        return False
+        state = get_user_state(self.context.get('request'))
+        return state is not None and state.contains(FAVORITES, obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return ShoppingCart.objects.filter(user_id=user.id,
-                                               recipe=obj).exists()
-        return False
+        state = get_user_state(self.context.get('request'))
+        return state is not None and state.contains(SHOPPING_CART, obj.id)
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
@@ -208,12 +215,19 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
         required=False,
         allow_null=True
     )
+    thumbnails = ThumbnailsField()
     name = serializers.ReadOnlyField()
     cooking_time = serializers.ReadOnlyField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'thumbnails', 'cooking_time',)
+
+
+class ShoppingCartSummarySerializer(serializers.Serializer):
+    name = serializers.CharField()
+    amount = serializers.IntegerField(source='total')
+    measurement_unit = serializers.CharField(source='unit')
 
 
 class RecipeCreateSerializer(ModelSerializer):
@@ -251,26 +265,28 @@ class RecipeCreateSerializer(ModelSerializer):
         return data
 
     def validate_ingredients(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
+        if not data:
             raise ValidationError(
                 {'ingredients': 'Нужно добавить ингредиент!'}
             )
-        seen_ingredients = []
-        for ingredient in ingredients:
-            if ingredient in seen_ingredients:
-                raise ValidationError(
-                    {'ingredients': 'Ингредиенты не могут повторяться'}
-                )
-            seen_ingredients.append(ingredient)
-            if int(ingredient['amount']) < 1:
-                raise ValidationError(
-                    {
-                        'amount': (
-                            'Количество ингредиентов не может быть меньше 1'
-                        )
-                    }
-                )
+        ingredient_ids = {item['ingredient_id'] for item in data}
+        if len(ingredient_ids) != len(data):
+            raise ValidationError(
+                {'ingredients': 'Ингредиенты не могут повторяться'}
+            )
+        if any(item['amount'] < 1 for item in data):
+            raise ValidationError(
+                {
+                    'amount': (
+                        'Количество ингредиентов не может быть меньше 1'
+                    )
+                }
+            )
+        if Ingredient.objects.filter(
+                id__in=ingredient_ids).count() != len(ingredient_ids):
+            raise ValidationError(
+                {'ingredients': 'Ингредиент не существует'}
+            )
         return data
 
     def validate_cooking_time(self, data):
@@ -288,8 +304,13 @@ class RecipeCreateSerializer(ModelSerializer):
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        prefetch_related_objects((instance,), 'tags', Prefetch(
+            'recipeingredients',
+            queryset=RecipeIngredients.objects.select_related('ingredient'),
+        ))
         return RecipeSerializer(instance, context=context).data
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -297,15 +318,52 @@ class RecipeCreateSerializer(ModelSerializer):
         if Recipe.objects.filter(name=name).exists():
             raise ValidationError({'name': 'Название рецепта уже существует'})
         recipe = Recipe.objects.create(**validated_data)
+        change_counter(CustomUser, recipe.author_id, 'recipes_count', 1)
         recipe.tags.set(tags)
-        for ingredient in ingredients:
-            RecipeIngredients.objects.create(
-                recipe=recipe,
-                ingredient=ingredient.get('id'),
-                amount=ingredient.get('amount'),
-            )
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, **ingredient)
+            for ingredient in ingredients
+        )
+        update_search_vector((recipe.pk,))
+        push_recipe(recipe)
         return recipe
 
+    def update_ingredients(self, instance, ingredients):
+        """Меняет только изменившиеся ингредиенты рецепта.
+
+        Возвращает изменения количеств для сумм в списках покупок.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in instance.recipeingredients.all()
+        }
+        amounts = {
+            item['ingredient_id']: item['amount'] for item in ingredients
+        }
+        removed = current.keys() - amounts.keys()
+        changed = [
+            item for pk, item in current.items()
+            if pk in amounts and item.amount != amounts[pk]
+        ]
+        deltas = {pk: -current[pk].amount for pk in removed}
+        for item in changed:
+            new_amount = amounts[item.ingredient_id]
+            deltas[item.ingredient_id] = new_amount - item.amount
+            item.amount = new_amount
+        added = [
+            RecipeIngredients(recipe=instance, ingredient_id=pk, amount=amount)
+            for pk, amount in amounts.items() if pk not in current
+        ]
+        deltas.update((item.ingredient_id, item.amount) for item in added)
+
+        if removed:
+            instance.recipeingredients.filter(
+                ingredient_id__in=removed).delete()
+        RecipeIngredients.objects.bulk_update(changed, ('amount',))
+        RecipeIngredients.objects.bulk_create(added)
+        return deltas
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         if tags is not None:
@@ -313,16 +371,12 @@ class RecipeCreateSerializer(ModelSerializer):
         ingredients = validated_data.pop('ingredients', None)
 
         name = validated_data.get('name')
-        if Recipe.objects.filter(name=name).exists():
+        if Recipe.objects.filter(name=name).exclude(pk=instance.pk).exists():
             raise ValidationError({'name': 'Название рецепта уже существует'})
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            for ingredient in ingredients:
-                amount = ingredient['amount']
-                RecipeIngredients.objects.update_or_create(
-                    recipe=instance,
-                    ingredient=ingredient.get('id'),
-                    defaults={'amount': amount},
-                )
+            ShoppingCartIngredient.objects.apply_delta(
+                instance.shoppingcart.values_list('user_id', flat=True),
+                self.update_ingredients(instance, ingredients),
+            )
         return super().update(instance, validated_data)
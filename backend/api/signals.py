@@ -0,0 +1,101 @@
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete,
+)
+from django.dispatch import receiver
+
+from ingredients.importer import ingredients_imported
+from ingredients.models import Ingredient
+from recipes.images import thumbnails_updated
+from recipes.models import Recipe, RecipeIngredients
+from recipes.trending import trending_updated
+from tag.models import Tag
+from users.models import CustomUser
+
+from .response_cache import (
+    ALL_RECIPES, CATALOG, INGREDIENTS, TAGS, TRENDING, author_scope,
+    bump_versions, recipe_scope, tag_scope,
+)
+
+PROFILE_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+
+def get_recipe_scopes(recipe, tags=None):
+    if tags is None:
+        tags = recipe.tags.all()
+    return (
+        ALL_RECIPES,
+        recipe_scope(recipe.pk),
+        author_scope(recipe.author_id),
+        *(tag_scope(slug) for slug in tags.values_list('slug', flat=True)),
+    )
+
+
+def get_author_scopes(author_id):
+    """Списки, в которых автор вложен в рецепты.
+
+    Страницы рецептов зависят от версии автора через ETag, поэтому
+    перебирать рецепты автора не нужно.
+    """
+    slugs = Tag.objects.filter(
+        recipes__author_id=author_id).values_list('slug', flat=True)
+    return (
+        ALL_RECIPES,
+        author_scope(author_id),
+        *(tag_scope(slug) for slug in slugs.distinct()),
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(pre_delete, sender=Recipe)
+@receiver(thumbnails_updated, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    bump_versions(*get_recipe_scopes(instance))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        bump_versions(CATALOG)
+    elif action == 'pre_clear':
+        bump_versions(*get_recipe_scopes(instance))
+    else:
+        bump_versions(*get_recipe_scopes(
+            instance, tags=Tag.objects.filter(pk__in=pk_set)))
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    recipe = Recipe.objects.filter(pk=instance.recipe_id).first()
+    if recipe is not None:
+        bump_versions(*get_recipe_scopes(recipe))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump_versions(CATALOG, TAGS)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(ingredients_imported, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    bump_versions(CATALOG, INGREDIENTS)
+
+
+@receiver(trending_updated, sender=Recipe)
+def invalidate_trending(sender, **kwargs):
+    bump_versions(TRENDING)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_author(sender, instance, created, update_fields, **kwargs):
+    if created or (
+            update_fields is not None
+            and not PROFILE_FIELDS & set(update_fields)):
+        return
+    bump_versions(*get_author_scopes(instance.pk))
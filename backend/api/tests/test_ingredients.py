@@ -0,0 +1,73 @@
+import tempfile
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ingredients.autocomplete import ingredient_index
+from ingredients.models import Ingredient
+
+from ..views import MAX_INGREDIENT_SEARCH_LIMIT
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class IngredientSearchLimitTest(TestCase):
+    """Лимит подсказок в поиске по базе, когда кеш не общий."""
+
+    url = '/api/ingredients/'
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'абрикос {i:03}', measurement_unit='г')
+            for i in range(MAX_INGREDIENT_SEARCH_LIMIT + 20)
+        )
+        Ingredient.objects.create(name='сушёный абрикос',
+                                  measurement_unit='г')
+
+    def setUp(self):
+        self.client = APIClient()
+        ingredient_index.invalidate()
+
+    def search(self, limit):
+        response = self.client.get(self.url, {'name': 'аб', 'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_limit(self):
+        result = self.search(3)
+        self.assertEqual(
+            [item['name'] for item in result],
+            ['абрикос 000', 'абрикос 001', 'абрикос 002'],
+        )
+
+    def test_invalid_limit_returns_all_matches(self):
+        total = MAX_INGREDIENT_SEARCH_LIMIT + 21
+        for limit in (-1, 0, 'abc', ''):
+            with self.subTest(limit=limit):
+                result = self.search(limit)
+                self.assertEqual(len(result), total)
+                self.assertEqual(result[-1]['name'], 'сушёный абрикос')
+
+    def test_limit_is_capped(self):
+        self.assertEqual(len(self.search(10 ** 6)),
+                         MAX_INGREDIENT_SEARCH_LIMIT)
+
+
+class SharedIngredientSearchLimitTest(IngredientSearchLimitTest):
+    """То же для индекса в памяти, который строится при общем кеше."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        caches = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.'
+                       'FileBasedCache',
+            'LOCATION': directory.name,
+        }})
+        caches.enable()
+        self.addCleanup(caches.disable)
+        super().setUp()
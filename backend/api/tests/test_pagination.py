@@ -0,0 +1,102 @@
+import json
+from base64 import urlsafe_b64encode
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import CustomUser
+
+from ..filters import RECIPE_ORDERINGS
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+def encode(value):
+    return urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class KeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='Автор', last_name='Авторов',
+        )
+        for i in range(11):
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Текст',
+                cooking_time=i % 3 + 1, favorites_count=i % 4,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def read_all(self, params):
+        page = self.get('/api/recipes/', {**params, 'cursor': ''})
+        ids = [recipe['id'] for recipe in page['results']]
+        while page['next']:
+            page = self.get(page['next'])
+            ids.extend(recipe['id'] for recipe in page['results'])
+        return ids
+
+    def test_round_trip(self):
+        for ordering, fields in RECIPE_ORDERINGS.items():
+            with self.subTest(ordering=ordering):
+                expected = list(Recipe.objects.order_by(
+                    *fields).values_list('id', flat=True))
+                self.assertEqual(
+                    self.read_all({'ordering': ordering, 'limit': 3}),
+                    expected)
+
+    def test_count_is_optional(self):
+        page = self.get('/api/recipes/', {'cursor': '', 'limit': 3})
+        self.assertNotIn('count', page)
+        self.assertEqual(len(page['results']), 3)
+        page = self.get('/api/recipes/',
+                        {'cursor': '', 'limit': 3, 'count': 'true'})
+        self.assertEqual(page['count'], 11)
+
+    def test_users(self):
+        for i in range(4):
+            CustomUser.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com',
+                password='pass', first_name='Имя', last_name='Фамилия',
+            )
+        page = self.get('/api/users/', {'cursor': '', 'limit': 2})
+        ids = [user['id'] for user in page['results']]
+        while page['next']:
+            page = self.get(page['next'])
+            ids.extend(user['id'] for user in page['results'])
+        self.assertEqual(ids, list(CustomUser.objects.order_by(
+            'id').values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        cursors = (
+            'not base64!',
+            urlsafe_b64encode(b'not json').decode(),
+            encode({'date': '2024-01-01'}),
+            encode(['2024-01-01T00:00:00+00:00']),
+            encode(['2024-01-01T00:00:00+00:00', 1, 2]),
+            encode(['not a date', 1]),
+            encode(['2024-01-01T00:00:00+00:00', 'abc']),
+            encode([True, 1]),
+            encode([None, 1]),
+        )
+        reader = APIClient()
+        reader.force_authenticate(CustomUser.objects.get())
+        for cursor in cursors:
+            for client, url in ((self.client, '/api/recipes/'),
+                                (reader, '/api/recipes/timeline/')):
+                with self.subTest(cursor=cursor, url=url):
+                    response = client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 404)
@@ -0,0 +1,48 @@
+import re
+
+from django.test import TestCase, override_settings
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient
+
+from api.serializers import ShortRecipeSerializer
+from recipes.models import Recipe
+from users.models import CustomUser
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES, REQUEST_PROFILING_SAMPLE_RATE=1)
+class RequestProfilingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='Автор', last_name='Авторов',
+        )
+        for i in range(3):
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Текст',
+                cooking_time=10,
+            )
+
+    def get_timing(self, path):
+        with self.assertLogs('api.profiling', 'INFO'):
+            response = APIClient().get(path)
+        self.assertEqual(response.status_code, 200)
+        return dict(re.findall(
+            r'(\w+);dur=([\d.]+)', response['Server-Timing']))
+
+    def test_serializer_time_is_reported(self):
+        timing = self.get_timing('/api/recipes/')
+        self.assertGreater(float(timing['serializer']), 0)
+        self.assertGreater(float(timing['db']), 0)
+
+    def test_serializers_are_not_patched_globally(self):
+        data = BaseSerializer.data
+        self.get_timing('/api/recipes/')
+        self.assertIs(BaseSerializer.data, data)
+        serializer = ShortRecipeSerializer(Recipe.objects.first())
+        self.assertIs(type(serializer), ShortRecipeSerializer)
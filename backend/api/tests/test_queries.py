@@ -0,0 +1,77 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from favorite.models import Favorite
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredients
+from shoppingcart.models import ShoppingCart
+from tag.models import Tag
+from users.models import CustomUser, FollowUser
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы.
+
+    Кеш локальный, поэтому ответы и состояние пользователя не кешируются
+    и каждый запрос честно проходит через базу.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='pass',
+            first_name='Читатель', last_name='Читателев',
+        )
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}')
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(5)
+        ]
+        for i in range(4):
+            author = CustomUser.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com',
+                password='pass', first_name='Автор', last_name=str(i),
+            )
+            for j in range(5):
+                recipe = Recipe.objects.create(
+                    author=author, name=f'Рецепт {i}-{j}', text='Текст',
+                    cooking_time=10,
+                )
+                recipe.tags.set(tags[:j % 3 + 1])
+                for k in range(3):
+                    RecipeIngredients.objects.create(
+                        recipe=recipe,
+                        ingredient=ingredients[(j + k) % 5],
+                        amount=k + 1,
+                    )
+            FollowUser.objects.create(user=cls.user, author=author)
+        for recipe in Recipe.objects.all()[:6]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertListQueries(self, client, num):
+        for limit in (2, 20):
+            with self.assertNumQueries(num):
+                response = client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), limit)
+
+    def test_anonymous(self):
+        self.assertListQueries(self.anonymous, 4)
+
+    def test_authenticated(self):
+        self.assertListQueries(self.client, 7)
@@ -0,0 +1,41 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from recipes.cooccurrence import compute_neighbours
+from recipes.dataset import DatasetGenerator
+from recipes.query_plans import (
+    explain, find_plan_problems, get_hot_queries,
+)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN в PostgreSQL')
+class QueryPlansTest(TestCase):
+    """Горячие запросы API читают большие таблицы по своим индексам.
+
+    На небольшом наборе данных планировщик и так выбрал бы Seq Scan,
+    поэтому он запрещается: если Seq Scan всё равно остаётся в плане
+    или запрос читает таблицу по чужому индексу, нужного индекса нет.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, _, cls.recipes = DatasetGenerator(
+            0, prefix='plan').generate(
+                users=50, recipes=300, tags=5, ingredients=100)
+        compute_neighbours(min_support=1)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_hot_queries_use_indexes(self):
+        queries = get_hot_queries(
+            self.users[0], self.users[1], self.tags[0],
+            self.recipes[len(self.recipes) // 2],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for name, queryset in queries.items():
+            with self.subTest(query=name):
+                self.assertEqual(
+                    find_plan_problems(name, explain(queryset)), [])
@@ -0,0 +1,117 @@
+import tempfile
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from tag.models import Tag
+from users.models import CustomUser
+
+from .. import response_cache
+
+
+class ResponseCacheInvalidationTest(TestCase):
+    """Версии кеша ответов после изменений через API.
+
+    Кеш файловый, то есть общий, и ответы действительно кешируются.
+    Версии меняются после фиксации транзакции, поэтому изменения
+    выполняются внутри captureOnCommitCallbacks.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.reader = cls.create_user('reader')
+        cls.tag = Tag.objects.create(name='Обед', color='#00ff00')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Суп', text='Текст', cooking_time=10)
+        cls.recipe.tags.set((cls.tag,))
+
+    @staticmethod
+    def create_user(username):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='pass', first_name=username, last_name=username,
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        caches = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.'
+                       'FileBasedCache',
+            'LOCATION': directory.name,
+        }})
+        caches.enable()
+        self.addCleanup(caches.disable)
+        self.anonymous = APIClient()
+        self.clients = {}
+        for user in (self.author, self.reader):
+            self.clients[user] = APIClient()
+            self.clients[user].force_authenticate(user)
+
+    def get_versions(self):
+        scopes = (
+            response_cache.ALL_RECIPES,
+            response_cache.tag_scope(self.tag.slug),
+            response_cache.author_scope(self.author.pk),
+            response_cache.recipe_scope(self.recipe.pk),
+        )
+        return dict(zip(scopes, response_cache.get_versions(scopes)))
+
+    def get_changed_scopes(self, user, method, url, data=None):
+        before = self.get_versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.clients[user], method)(
+                url, data, format='json')
+        self.assertLess(response.status_code, 300)
+        after = self.get_versions()
+        return {scope for scope in before if before[scope] != after[scope]}
+
+    def test_list_is_served_from_cache_until_recipe_changes(self):
+        self.assertEqual(self.anonymous.get('/api/recipes/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.anonymous.get('/api/recipes/')
+        self.assertEqual(response.json()['results'][0]['name'], 'Суп')
+        scopes = self.get_changed_scopes(
+            self.author, 'patch', f'/api/recipes/{self.recipe.pk}/',
+            {'name': 'Борщ', 'cooking_time': 10})
+        self.assertEqual(scopes, set(self.get_versions()))
+        response = self.anonymous.get('/api/recipes/')
+        self.assertEqual(response.json()['results'][0]['name'], 'Борщ')
+
+    def test_subscribe_bumps_only_author(self):
+        scopes = self.get_changed_scopes(
+            self.reader, 'post', f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(
+            scopes, {response_cache.author_scope(self.author.pk)})
+
+    def test_favorite_bumps_recipe_and_author(self):
+        scopes = self.get_changed_scopes(
+            self.reader, 'post', f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(scopes, {
+            response_cache.recipe_scope(self.recipe.pk),
+            response_cache.author_scope(self.author.pk),
+        })
+
+    def test_shopping_cart_bumps_nothing(self):
+        scopes = self.get_changed_scopes(
+            self.reader, 'post',
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+        self.assertEqual(scopes, set())
+
+    def test_recipe_etag(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        etag = self.anonymous.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        for method, action_url in (
+                ('post', f'/api/users/{self.author.pk}/subscribe/'),
+                ('post', f'{url}favorite/')):
+            with self.subTest(url=action_url):
+                self.get_changed_scopes(self.reader, method, action_url)
+                response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                etag = response['ETag']
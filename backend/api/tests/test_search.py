@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import CustomUser
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RecipeSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='Автор', last_name='Авторов',
+        )
+        cls.soup = Recipe.objects.create(
+            author=author, name='Суп гороховый', text='Горох и вода',
+            cooking_time=60,
+        )
+        cls.stew = Recipe.objects.create(
+            author=author, name='Рагу', text='Овощи, суп не нужен',
+            cooking_time=40,
+        )
+        for i in range(4):
+            Recipe.objects.create(
+                author=author, name=f'Суп {i}', text='Суп суп суп',
+                cooking_time=30,
+            )
+        Recipe.objects.create(
+            author=author, name='Каша', text='Крупа', cooking_time=20,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get_names(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {recipe['name'] for recipe in response.data['results']}
+
+    def test_fallback_ignores_case_of_cyrillic(self):
+        with mock.patch('recipes.search.is_full_text_search_supported',
+                        return_value=False):
+            names = self.get_names(
+                self.client.get('/api/recipes/', {'search': 'суп'}))
+            self.assertIn('Суп гороховый', names)
+            self.assertIn('Рагу', names)
+            self.assertNotIn('Каша', names)
+            names = self.get_names(
+                self.client.get('/api/recipes/', {'search': 'ГОРОХ'}))
+            self.assertEqual(names, {'Суп гороховый'})
+
+    def test_ranked_search_ignores_cursor(self):
+        """Поиск по релевантности листается номерами страниц."""
+        response = self.client.get(
+            '/api/recipes/', {'search': 'суп', 'cursor': '', 'limit': 2})
+        self.get_names(response)
+        self.assertIn('count', response.data)
+        self.assertIn('page=2', response.data['next'])
+
+    def test_search_with_ordering_uses_cursor(self):
+        params = {
+            'search': 'суп', 'ordering': 'newest', 'cursor': '', 'limit': 2,
+        }
+        response = self.client.get('/api/recipes/', params)
+        seen = self.get_names(response)
+        while response.data['next']:
+            self.assertIn('cursor=', response.data['next'])
+            response = self.client.get(response.data['next'])
+            names = self.get_names(response)
+            self.assertFalse(seen & names)
+            seen |= names
+        self.assertNotIn('Каша', seen)
+        self.assertIn('Суп гороховый', seen)
@@ -0,0 +1,125 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredients
+from shoppingcart.models import ShoppingCartIngredient
+from tag.models import Tag
+from users.models import CustomUser
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ShoppingCartTotalsTest(TestCase):
+    """Суммы ингредиентов списков покупок после изменений рецептов.
+
+    Суммы меняются на разницу, поэтому после каждого шага они должны
+    совпадать с пересчётом по рецептам в списках.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.buyers = [cls.create_user(f'buyer{i}') for i in range(2)]
+        cls.tag = Tag.objects.create(name='Обед', color='#00ff00')
+        cls.flour, cls.milk, cls.egg = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'молоко', 'яйцо')
+        )
+        cls.pancakes = cls.create_recipe(
+            'Блины', {cls.flour: 200, cls.milk: 500})
+        cls.bread = cls.create_recipe('Хлеб', {cls.flour: 300})
+
+    @staticmethod
+    def create_user(username):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='pass', first_name=username, last_name=username,
+        )
+
+    @classmethod
+    def create_recipe(cls, name, amounts):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text='Текст', cooking_time=10)
+        recipe.tags.set((cls.tag,))
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient=ingredient,
+                              amount=amount)
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+
+    def setUp(self):
+        self.clients = {}
+        for user in (self.author, *self.buyers):
+            self.clients[user] = APIClient()
+            self.clients[user].force_authenticate(user)
+        for buyer in self.buyers:
+            self.add_to_cart(buyer, self.pancakes)
+        self.add_to_cart(self.buyers[0], self.bread)
+
+    def add_to_cart(self, user, recipe):
+        response = self.clients[user].post(
+            f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+
+    def get_totals(self, user):
+        return dict(ShoppingCartIngredient.objects.filter(
+            user=user).values_list('ingredient__name', 'amount'))
+
+    def assertTotalsConsistent(self):
+        self.assertEqual(
+            set(ShoppingCartIngredient.objects.values_list(
+                'user', 'ingredient', 'amount')),
+            {(row['user'], row['ingredient'], row['total'])
+             for row in ShoppingCartIngredient.objects.calculate()},
+        )
+
+    def update_pancakes(self, amounts):
+        response = self.clients[self.author].patch(
+            f'/api/recipes/{self.pancakes.pk}/', {
+                'name': 'Блины', 'text': 'Текст', 'cooking_time': 10,
+                'tags': [self.tag.pk],
+                'ingredients': [
+                    {'id': ingredient.pk, 'amount': amount}
+                    for ingredient, amount in amounts.items()
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_add(self):
+        self.assertEqual(self.get_totals(self.buyers[0]),
+                         {'мука': 500, 'молоко': 500})
+        self.assertEqual(self.get_totals(self.buyers[1]),
+                         {'мука': 200, 'молоко': 500})
+        self.assertTotalsConsistent()
+
+    def test_update_changes_removes_and_adds_ingredients(self):
+        self.update_pancakes({self.flour: 250, self.egg: 2})
+        self.assertEqual(self.get_totals(self.buyers[0]),
+                         {'мука': 550, 'яйцо': 2})
+        self.assertEqual(self.get_totals(self.buyers[1]),
+                         {'мука': 250, 'яйцо': 2})
+        self.assertTotalsConsistent()
+
+    def test_update_without_ingredients_keeps_totals(self):
+        response = self.clients[self.author].patch(
+            f'/api/recipes/{self.pancakes.pk}/',
+            {'name': 'Тонкие блины', 'cooking_time': 15}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_totals(self.buyers[1]),
+                         {'мука': 200, 'молоко': 500})
+
+    def test_remove_from_cart_and_delete_recipe(self):
+        response = self.clients[self.buyers[0]].delete(
+            f'/api/recipes/{self.bread.pk}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_totals(self.buyers[0]),
+                         {'мука': 200, 'молоко': 500})
+        response = self.clients[self.author].delete(
+            f'/api/recipes/{self.pancakes.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(ShoppingCartIngredient.objects.exists())
@@ -0,0 +1,85 @@
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import caches
+
+from favorite.models import Favorite
+from foodgram.caches import is_shared
+from shoppingcart.models import ShoppingCart
+from users.models import FollowUser
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+SUBSCRIPTIONS = 'subscriptions'
+
+SOURCES = {
+    FAVORITES: (Favorite, 'recipe_id'),
+    SHOPPING_CART: (ShoppingCart, 'recipe_id'),
+    SUBSCRIPTIONS: (FollowUser, 'author_id'),
+}
+MODEL_KINDS = {model: kind for kind, (model, _) in SOURCES.items()}
+
+
+class UserState:
+    """Множества id избранного, списка покупок и подписок пользователя.
+
+    Множество хранится в кеше отсортированным массивом 64-битных целых,
+    загружается из базы при первом обращении и перезаписывается после
+    каждого изменения. Проверка принадлежности - бинарный поиск.
+    Если USER_STATE_CACHE не общий для процессов, множества читаются
+    из базы одним запросом на вид за запрос и в кеш не попадают.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.cache = (
+            caches[settings.USER_STATE_CACHE]
+            if is_shared(settings.USER_STATE_CACHE) else None
+        )
+        self._ids = {}
+
+    def get_key(self, kind):
+        return f'user_state:{kind}:{self.user_id}'
+
+    def load(self, kind):
+        model, field = SOURCES[kind]
+        ids = array('q', sorted(
+            model.objects.filter(user_id=self.user_id)
+            .values_list(field, flat=True)
+        ))
+        if self.cache is not None:
+            self.cache.set(
+                self.get_key(kind), ids.tobytes(),
+                settings.USER_STATE_CACHE_TIMEOUT,
+            )
+        self._ids[kind] = ids
+        return ids
+
+    def get_ids(self, kind):
+        if kind in self._ids:
+            return self._ids[kind]
+        if self.cache is None:
+            return self.load(kind)
+        data = self.cache.get(self.get_key(kind))
+        if data is None:
+            return self.load(kind)
+        ids = array('q')
+        ids.frombytes(data)
+        self._ids[kind] = ids
+        return ids
+
+    def contains(self, kind, pk):
+        ids = self.get_ids(kind)
+        position = bisect_left(ids, pk)
+        return position < len(ids) and ids[position] == pk
+
+
+def get_user_state(request):
+    """Состояние текущего пользователя, одно на запрос."""
+    if request is None or not request.user.is_authenticated:
+        return None
+    state = getattr(request, '_user_state', None)
+    if state is None:
+        state = request._user_state = UserState(request.user.id)
+    return state
@@ -1,16 +1,33 @@
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (
+    IsAdminUser, IsAuthenticated, SAFE_METHODS,
+)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+import hashlib
+import time
+
 from djoser.views import UserViewSet
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import (
+    Case, F, IntegerField, Prefetch, Value, When, Window,
+    prefetch_related_objects,
+)
 from django.db.models.aggregates import Sum
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 
 
-from .pagination import CustomPagination
+from .pagination import CustomPagination, TimelinePagination
 from .serializers import (
     ChangePasswordSerializer,
     CustomUserSerializer,
@@ -19,22 +36,134 @@ from .serializers import (
     IngredientSerializer,
     RecipeSerializer,
     RecipeCreateSerializer,
-    ShortRecipeSerializer
+    ShortRecipeSerializer,
+    ShoppingCartSummarySerializer,
+    get_recipes_limit,
 )
-from .filters import RecipesFilterSet, IngredientFilter
+from .filters import RECIPE_ORDERINGS, RecipesFilterSet
 from .permissions import AdminOrReadOnly, IsAuthorOrReadOnly
+from . import response_cache
+from .async_views import AsyncReadMixin
+from .profiling import ProfiledSerializerMixin, profile_serializer
+from .renderers import (
+    CSVShoppingListRenderer,
+    JSONShoppingListRenderer,
+    TextShoppingListRenderer,
+)
+from .user_state import (
+    FAVORITES, MODEL_KINDS, SHOPPING_CART, SUBSCRIPTIONS, get_user_state,
+)
 from users.models import CustomUser, FollowUser
 from tag.models import Tag
-from ingredients.models import Ingredient
-from recipes.models import Recipe, RecipeIngredients
-from shoppingcart.models import ShoppingCart
+from ingredients.autocomplete import ingredient_index
+from ingredients.models import Ingredient, NORMALIZED_UNITS
+from recipes.counters import change_counter
+from recipes.models import Recipe, RecipeIngredients, RecipeNeighbour
+from recipes.recommendations import recipe_index
+from shoppingcart.models import ShoppingCart, ShoppingCartIngredient
+from timeline import feed as timeline
 from favorite.models import Favorite
 
 
-class UserViewSet(UserViewSet):
+SHOPPING_CART_CHUNK_SIZE = 500
+RECOMMENDATIONS_LIMIT = 10
+MAX_RECOMMENDATIONS_LIMIT = 100
+MAX_INGREDIENT_SEARCH_LIMIT = 100
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+
+def get_recipes_queryset():
+    """Выборка рецептов для чтения без запросов на каждую строку.
+
+    Флаги избранного, списка покупок и подписки сериализаторы берут
+    из UserState, поэтому в запрос они не входят.
+    """
+    return Recipe.objects.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'recipeingredients',
+            queryset=RecipeIngredients.objects.select_related('ingredient'),
+        ),
+    )
+
+
+def get_recommendations_limit(request):
+    try:
+        limit = int(request.query_params['limit'])
+    except (KeyError, ValueError):
+        return RECOMMENDATIONS_LIMIT
+    return min(max(limit, 1), MAX_RECOMMENDATIONS_LIMIT)
+
+
+def get_ingredient_search_limit(request):
+    """Лимит подсказок из параметра limit.
+
+    Без параметра или при значении меньше единицы возвращаются все
+    совпадения, большие значения урезаются до максимума.
+    """
+    try:
+        limit = int(request.query_params['limit'])
+    except (KeyError, ValueError):
+        return None
+    return min(limit, MAX_INGREDIENT_SEARCH_LIMIT) if limit > 0 else None
+
+
+def limit_recipes_per_author(queryset, limit):
+    """Оставляет не больше limit последних рецептов каждого автора.
+
+    Нумерация строк считается оконной функцией ROW_NUMBER() в подзапросе,
+    поэтому рецепты всех авторов выбираются одним запросом.
+    """
+    if not limit:
+        return queryset
+    ranked = queryset.order_by().annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('date').desc(), F('id').desc()),
+        )
+    ).values('id', 'row_number')
+    sql, params = ranked.query.sql_with_params()
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) ranked '
+        'WHERE ranked.row_number <= %s',
+        (*params, limit),
+    ))
+
+
+def aggregate_ingredients(queryset):
+    """Суммирует ингредиенты выборки с приведением единиц измерения.
+
+    Выборка должна содержать поля ingredient и amount.
+    """
+    measurement_unit = 'ingredient__measurement_unit'
+    unit = Case(
+        *(When(**{measurement_unit: source}, then=Value(target))
+          for source, (target, _) in NORMALIZED_UNITS.items()),
+        default=F(measurement_unit),
+    )
+    factor = Case(
+        *(When(**{measurement_unit: source}, then=Value(factor))
+          for source, (_, factor) in NORMALIZED_UNITS.items()),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+    return (
+        queryset
+        .values(name=F('ingredient__name'), unit=unit)
+        .annotate(total=Sum(F('amount') * factor))
+        .order_by('name', 'unit')
+    )
+
+
+class UserViewSet(ProfiledSerializerMixin, UserViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
+    cursor_ordering = ('id',)
 
     @action(
         detail=False,
@@ -42,7 +171,7 @@ class UserViewSet(UserViewSet):
         pagination_class=None,
         permission_classes=(IsAuthenticated,))
     def me(self, request):
-        serializer = CustomUserSerializer(request.user)
+        serializer = profile_serializer(CustomUserSerializer(request.user))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(
@@ -67,52 +196,114 @@ class UserViewSet(UserViewSet):
         author = get_object_or_404(CustomUser, pk=id)
 
         if request.method == 'POST':
-            serializer = SubscriptionsSerializer(
+            serializer = profile_serializer(SubscriptionsSerializer(
                 author, data=request.data, context={'request': request}
-            )
+            ))
             serializer.is_valid(raise_exception=True)
-            FollowUser.objects.create(user=user, author=author)
+            with transaction.atomic():
+                FollowUser.objects.create(user=user, author=author)
+                change_counter(CustomUser, author.pk, 'followers_count', 1)
+                timeline.add_author(user.pk, author.pk)
+            response_cache.bump_versions(
+                response_cache.author_scope(author.pk))
+            author.refresh_from_db(fields=('followers_count',))
+            get_user_state(request).load(SUBSCRIPTIONS)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            get_object_or_404(
-                FollowUser, user=user, author=author
-            ).delete()
+            with transaction.atomic():
+                get_object_or_404(
+                    FollowUser, user=user, author=author
+                ).delete()
+                change_counter(CustomUser, author.pk, 'followers_count', -1)
+                timeline.remove_author(user.pk, author.pk)
+            response_cache.bump_versions(
+                response_cache.author_scope(author.pk))
+            get_user_state(request).load(SUBSCRIPTIONS)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         user = request.user
-        queryset = CustomUser.objects.filter(following__user=user)
+        queryset = CustomUser.objects.filter(
+            following__user=user
+        ).order_by('id')
         pages = self.paginate_queryset(queryset)
-        serializer = SubscriptionsSerializer(
-            pages, many=True, context={'request': request}
+        recipes = limit_recipes_per_author(
+            Recipe.objects.filter(author__in=pages),
+            get_recipes_limit(request),
         )
+        prefetch_related_objects(pages, Prefetch(
+            'recipes', queryset=recipes, to_attr='limited_recipes'
+        ))
+        serializer = profile_serializer(SubscriptionsSerializer(
+            pages, many=True, context={'request': request}
+        ))
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class PrecomputedListMixin:
+    """Отдаёт список целиком из заранее отрендеренного JSON.
+
+    ETag - версия таблицы из response_cache, поэтому на If-None-Match
+    ответ 304 приходит без запросов к базе и сериализации. Без общего
+    кеша список каждый раз строится из базы.
+    """
+    version_scope = None
+
+    def list(self, request, *args, **kwargs):
+        if (request.accepted_renderer.format != 'json'
+                or not response_cache.is_enabled()):
+            return super().list(request, *args, **kwargs)
+        version, = response_cache.get_versions((self.version_scope,))
+        etag = f'"{self.version_scope}-{version}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            cache = response_cache.get_cache()
+            key = f'payload:{self.version_scope}:{version}'
+            content = cache.get(key)
+            if content is None:
+                serializer = self.get_serializer(
+                    self.filter_queryset(self.get_queryset()), many=True)
+                content = JSONRenderer().render(serializer.data)
+                cache.set(key, content, settings.CATALOG_CACHE_TIMEOUT)
+            response = HttpResponse(
+                content, content_type=JSONRenderer.media_type)
+        response['ETag'] = etag
+        return response
+
+
+class TagViewSet(AsyncReadMixin, ProfiledSerializerMixin,
+                 PrecomputedListMixin, viewsets.ReadOnlyModelViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AdminOrReadOnly,)
     search_fields = ('^name',)
     pagination_class = None
+    version_scope = response_cache.TAGS
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AsyncReadMixin, ProfiledSerializerMixin,
+                        PrecomputedListMixin, viewsets.ReadOnlyModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AdminOrReadOnly,)
-    search_fields = ('^name',)
     pagination_class = None
-    filter_backends = (IngredientFilter, )
+    version_scope = response_cache.INGREDIENTS
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(
+            name, limit=get_ingredient_search_limit(request)))
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AsyncReadMixin, ProfiledSerializerMixin,
+                    viewsets.ModelViewSet):
 
-    queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     filterset_class = RecipesFilterSet
     filter_backends = (DjangoFilterBackend, )
@@ -120,6 +311,132 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthorOrReadOnly]
     add_serializer = ShortRecipeSerializer
 
+    @property
+    def cursor_ordering(self):
+        """Порядок для курсора; None для поиска без ordering.
+
+        Результаты поиска сортируются по релевантности, которой нет
+        среди полей рецепта, и листаются по номерам страниц.
+        """
+        params = self.request.query_params
+        if not params.get('ordering') and params.get('search', '').strip():
+            return None
+        return RECIPE_ORDERINGS.get(
+            params.get('ordering'), RECIPE_ORDERINGS['newest'])
+
+    def get_queryset(self):
+        return get_recipes_queryset()
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов; анонимным отдаётся из кеша ответов."""
+        cache_key = response_cache.get_cache_key(request)
+        cached = cache_key and response_cache.get_cache().get(cache_key)
+        if cached:
+            response_cache.record(hit=True)
+            content, content_type, etag, last_modified = cached
+            return get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            ) or self.make_cached_response(
+                HttpResponse(content, content_type=content_type),
+                etag, last_modified,
+            )
+        if cache_key:
+            response_cache.record(hit=False)
+        response = super().list(request, *args, **kwargs)
+        response.cache_key = cache_key
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        cache_key = getattr(response, 'cache_key', None)
+        if cache_key and response.status_code == status.HTTP_200_OK:
+            response.render()
+            etag = '"{}"'.format(hashlib.md5(response.content).hexdigest())
+            last_modified = int(time.time())
+            response_cache.get_cache().set(
+                cache_key,
+                (response.content, response['Content-Type'],
+                 etag, last_modified),
+                settings.RECIPE_LIST_CACHE_TIMEOUT,
+            )
+            self.make_cached_response(response, etag, last_modified)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт; при совпадении If-None-Match ответ 304 без выборки."""
+        etag = self.get_recipe_etag(request, kwargs['pk'])
+        response = etag and get_conditional_response(request, etag=etag)
+        if not response:
+            response = super().retrieve(request, *args, **kwargs)
+        if etag and response.status_code in (status.HTTP_200_OK,
+                                             status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+        return response
+
+    def get_recipe_etag(self, request, pk):
+        """ETag рецепта из версий в кеше и флагов пользователя.
+
+        В рецепт вложен автор с числом подписчиков, поэтому в ETag
+        входит и версия автора. Автор рецепта не меняется, и его id
+        кешируется: повторная проверка обходится без запросов к базе.
+        """
+        if not response_cache.is_enabled() or not str(pk).isdigit():
+            return None
+        pk = int(pk)
+        author_id = self.get_recipe_author(pk)
+        if author_id is None:
+            return None
+        parts = [
+            request.accepted_renderer.format,
+            *response_cache.get_versions((
+                response_cache.recipe_scope(pk),
+                response_cache.author_scope(author_id),
+                response_cache.CATALOG,
+            )),
+        ]
+        state = get_user_state(request)
+        if state is not None:
+            parts += [
+                state.contains(FAVORITES, pk),
+                state.contains(SHOPPING_CART, pk),
+                state.contains(SUBSCRIPTIONS, author_id),
+            ]
+        return '"{}"'.format(hashlib.md5(repr(parts).encode()).hexdigest())
+
+    @staticmethod
+    def get_recipe_author(pk):
+        cache = response_cache.get_cache()
+        key = f'recipe_author:{pk}'
+        author_id = cache.get(key)
+        if author_id is None:
+            author_id = Recipe.objects.filter(pk=pk).values_list(
+                'author_id', flat=True).first()
+            if author_id is not None:
+                cache.set(key, author_id, timeout=None)
+        return author_id
+
+    @staticmethod
+    def make_cached_response(response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    @action(detail=False, permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(response_cache.get_stats())
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def timeline(self, request):
+        """Новые рецепты авторов из подписок пользователя."""
+        paginator = TimelinePagination(page_size=settings.REST_FRAMEWORK[
+            'PAGE_SIZE'])
+        recipe_ids = paginator.paginate_timeline(request.user, request)
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeSerializer
@@ -131,6 +448,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ShoppingCartIngredient.objects.apply_recipe(
+            instance.shoppingcart.values_list('user_id', flat=True),
+            instance, sign=-1,
+        )
+        instance.delete()
+        change_counter(CustomUser, instance.author_id, 'recipes_count', -1)
+
     @action(detail=True, methods=['post', 'delete'])
     def favorite(self, request, pk):
 
@@ -151,54 +477,121 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                       pk, add=False)
 
     def add_or_remove(self, model, user, pk, add=False):
-        if add:
-            if model.objects.filter(user=user, recipe__id=pk).exists():
-                return Response({'errors': 'Рецепт уже добавлен!'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            recipe = get_object_or_404(Recipe, id=pk)
-            model.objects.create(user=user, recipe=recipe)
-        else:
-            obj = model.objects.filter(user=user, recipe__id=pk)
-            if obj.exists():
-                obj.delete()
+        recipe = get_object_or_404(Recipe, id=pk)
+        with transaction.atomic():
+            if add:
+                if model.objects.filter(user=user, recipe=recipe).exists():
+                    return Response({'errors': 'Рецепт уже добавлен!'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                model.objects.create(user=user, recipe=recipe)
             else:
-                return Response({'errors': 'Рецепт уже удален!'},
-                                status=status.HTTP_400_BAD_REQUEST)
-        serializer = ShortRecipeSerializer(recipe)
+                deleted, _ = model.objects.filter(
+                    user=user, recipe=recipe).delete()
+                if not deleted:
+                    return Response({'errors': 'Рецепт уже удален!'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+            change_counter(Recipe, recipe.pk, RECIPE_COUNTERS[model],
+                           1 if add else -1)
+            if model is ShoppingCart:
+                ShoppingCartIngredient.objects.apply_recipe(
+                    (user.id,), recipe, sign=1 if add else -1)
+        if model is Favorite:
+            response_cache.bump_versions(
+                response_cache.recipe_scope(recipe.pk),
+                response_cache.author_scope(recipe.author_id),
+            )
+        get_user_state(self.request).load(MODEL_KINDS[model])
+        serializer = profile_serializer(ShortRecipeSerializer(recipe))
         return Response(serializer.data,
                         status=status.HTTP_201_CREATED
                         if add else status.HTTP_204_NO_CONTENT)
 
     @action(detail=False,
             methods=['GET'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            renderer_classes=(TextShoppingListRenderer,
+                              CSVShoppingListRenderer,
+                              JSONShoppingListRenderer))
     def download_shopping_cart(self, request):
-        user = request.user
-        ingredients = self.get_shopping_cart_ingredients(user)
-        result = self.format_ingredients_as_text(ingredients)
-
-        headers = {
-            'Content-Disposition': 'attachment; filename=shopping_cart.txt'
-        }
-        return HttpResponse(
-            result, content_type='text/plain; charset=UTF-8', headers=headers
+        renderer = request.accepted_renderer
+        ingredients = self.get_shopping_cart_ingredients(request.user)
+        response = StreamingHttpResponse(
+            renderer.stream(
+                ingredients.iterator(chunk_size=SHOPPING_CART_CHUNK_SIZE)
+            ),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping_cart.{renderer.format}'
         )
+        return response
+
+    @action(detail=False)
+    def what_can_i_cook(self, request):
+        """Рецепты по доле ингредиентов из параметра ingredients."""
+        try:
+            ingredient_ids = [
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            ]
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Ожидаются id ингредиентов.'})
+        ranked = recipe_index.get().rank_by_ingredients(
+            ingredient_ids, get_recommendations_limit(request))
+        return self.get_recommendations_response(
+            ranked, ('coverage', 'missing'))
+
+    @action(detail=True)
+    def similar(self, request, pk):
+        """Рецепты с похожим набором ингредиентов."""
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        ranked = recipe_index.get().similar(
+            recipe.pk, get_recommendations_limit(request))
+        return self.get_recommendations_response(ranked, ('similarity',))
+
+    @action(detail=True)
+    def recommended(self, request, pk):
+        """Рецепты, которые добавляют вместе с этим.
+
+        Если соседей не хватает, например у нового рецепта, список
+        дополняется популярными за последнее время, у них score пустой.
+        """
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        limit = get_recommendations_limit(request)
+        ranked = list(RecipeNeighbour.objects.filter(
+            recipe=recipe).order_by('-score').values_list(
+            'neighbour_id', 'score')[:limit])
+        if len(ranked) < limit:
+            exclude = {recipe.pk, *(row[0] for row in ranked)}
+            ranked.extend(
+                (recipe_id, None)
+                for recipe_id in Recipe.objects.exclude(pk__in=exclude)
+                .order_by(*RECIPE_ORDERINGS['trending'])
+                .values_list('id', flat=True)[:limit - len(ranked)]
+            )
+        return self.get_recommendations_response(ranked, ('score',))
+
+    def get_recommendations_response(self, ranked, fields):
+        recipes = Recipe.objects.in_bulk(row[0] for row in ranked)
+        ranked = [row for row in ranked if row[0] in recipes]
+        data = profile_serializer(ShortRecipeSerializer(
+            [recipes[row[0]] for row in ranked],
+            many=True, context={'request': self.request},
+        )).data
+        for item, (_, *values) in zip(data, ranked):
+            item.update(zip(fields, values))
+        return Response(data)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def shopping_cart_summary(self, request):
+        ingredients = self.get_shopping_cart_ingredients(request.user)
+        serializer = profile_serializer(
+            ShoppingCartSummarySerializer(ingredients, many=True))
+        return Response(serializer.data)
 
     def get_shopping_cart_ingredients(self, user):
-        shopping_cart_recipes = Recipe.objects.filter(shoppingcart__user=user)
-        ingredients = (
-            RecipeIngredients.objects.filter(recipe__in=shopping_cart_recipes)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(amount=Sum('amount'))
+        return aggregate_ingredients(
+            ShoppingCartIngredient.objects.filter(user=user)
         )
-        return ingredients
-
-    def format_ingredients_as_text(self, ingredients):
-        result = ''
-        for i in ingredients:
-            result += (
-                f' {i["ingredient__name"]}-'
-                f' {i["amount"]}-'
-                f' {i["ingredient__measurement_unit"]}\n'
-            )
-        return result
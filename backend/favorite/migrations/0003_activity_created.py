@@ -0,0 +1,25 @@
+# Generated by Django 3.2.1 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import datetime
+from django.utils.timezone import utc
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorite', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=datetime.datetime(1970, 1, 1, 0, 0, tzinfo=utc), verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['created', 'recipe'], name='favorite_created_idx'),
+        ),
+    ]
@@ -8,13 +8,19 @@ class Favorite(models.Model):
         CustomUser,
         verbose_name='Пользователь',
         related_name='favorite',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
         verbose_name='Рецепт',
         related_name='favorite',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    created = models.DateTimeField(
+        verbose_name='Добавлен',
+        auto_now_add=True
     )
 
     class Meta:
@@ -25,6 +31,14 @@ class Favorite(models.Model):
                 fields=('user', 'recipe'), name='unique_favorite'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'), name='favorite_recipe_user_idx'
+            ),
+            models.Index(
+                fields=('created', 'recipe'), name='favorite_created_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.user} - {self.recipe}'
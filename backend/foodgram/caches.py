@@ -0,0 +1,17 @@
+from django.conf import settings
+
+LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def is_shared(alias='default'):
+    """Видят ли кеш alias все процессы сервера.
+
+    Кеш в памяти процесса у каждого воркера gunicorn свой: изменение,
+    записанное одним воркером, остальные не увидят до истечения
+    таймаута. Данные, которые должны совпадать между процессами,
+    в таком кеше хранить нельзя.
+    """
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_BACKENDS
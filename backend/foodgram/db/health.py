@@ -0,0 +1,13 @@
+import psycopg2
+
+
+def ping(connection):
+    """Проверяет соединение psycopg2 запросом SELECT 1."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
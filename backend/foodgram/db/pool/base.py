@@ -0,0 +1,81 @@
+"""PostgreSQL с пулом соединений внутри процесса.
+
+Закрытие соединения Django возвращает его в пул psycopg2, поэтому
+при CONN_MAX_AGE = 0 запрос не тратит время на установку соединения.
+Параметры пула задаются в DATABASES[...]['POOL_OPTIONS']: psycopg2
+держит открытыми не больше MIN_SIZE свободных соединений, а всего
+выдаёт не больше MAX_SIZE.
+"""
+import threading
+
+import psycopg2.extras
+from psycopg2 import pool
+
+from ..health import ping
+from ..postgresql import base
+
+_pools = {}
+_lock = threading.Lock()
+
+
+class BlockingConnectionPool(pool.ThreadedConnectionPool):
+    """Пул, который ждёт свободное соединение, а не сразу падает."""
+
+    def __init__(self, minconn, maxconn, timeout, *args, **kwargs):
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise pool.PoolError('Нет свободных соединений в пуле')
+        try:
+            return super().getconn(key)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self.slots.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pool(self, conn_params):
+        with _lock:
+            if self.alias not in _pools:
+                options = self.settings_dict.get('POOL_OPTIONS', {})
+                _pools[self.alias] = BlockingConnectionPool(
+                    options.get('MIN_SIZE', 4),
+                    options.get('MAX_SIZE', 10),
+                    options.get('TIMEOUT', 10),
+                    **conn_params,
+                )
+        return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        connection_pool = self.get_pool(conn_params)
+        connection = connection_pool.getconn()
+        if (self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not ping(connection)):
+            connection_pool.putconn(connection, close=True)
+            connection = connection_pool.getconn()
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                _pools[self.alias].putconn(
+                    self.connection,
+                    close=self.connection.closed or self.errors_occurred,
+                )
@@ -0,0 +1,43 @@
+"""PostgreSQL с проверкой переиспользуемых соединений из Django 4.1.
+
+При CONN_HEALTH_CHECKS соединение, оставшееся от прошлого запроса,
+проверяется запросом SELECT 1 перед первым использованием в новом
+запросе и закрывается, если не отвечает, например после перезапуска
+PostgreSQL. Запросы, которые не обращаются к базе, и следующие
+обращения в том же запросе проверку не делают.
+"""
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return bool(self.settings_dict.get('CONN_HEALTH_CHECKS'))
+
+    def connect(self):
+        self.health_check_done = True
+        super().connect()
+
+    def close_if_unusable_or_obsolete(self):
+        if self.connection is not None:
+            self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def close_if_health_check_failed(self):
+        if (self.connection is None
+                or not self.health_check_enabled
+                or self.health_check_done):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def set_autocommit(self, autocommit, *args, **kwargs):
+        self.close_if_health_check_failed()
+        super().set_autocommit(autocommit, *args, **kwargs)
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -30,9 +30,11 @@ INSTALLED_APPS = [
     'recipes',
     'favorite',
     'shoppingcart',
+    'timeline',
     'corsheaders'
 ]
 MIDDLEWARE = [
+    'api.profiling.request_profiling_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,19 +65,82 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+ASYNC_READ_THREADS = int(os.getenv('ASYNC_READ_THREADS', 8))
+
+REQUEST_PROFILING_SAMPLE_RATE = float(
+    os.getenv('REQUEST_PROFILING_SAMPLE_RATE', 0)
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.profiling': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
 
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'foodgram.db.pool'
+            if os.getenv('DB_POOL', 'False') == 'True'
+            else 'foodgram.db.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+        ),
+        'POOL_OPTIONS': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 4)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.memcached.PyMemcacheCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'memcached:11211'),
+    }
+}
+
+USER_STATE_CACHE = 'default'
+USER_STATE_CACHE_TIMEOUT = int(os.getenv('USER_STATE_CACHE_TIMEOUT', 86400))
+
+RECIPE_LIST_CACHE = 'default'
+RECIPE_LIST_CACHE_TIMEOUT = int(os.getenv('RECIPE_LIST_CACHE_TIMEOUT', 300))
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 86400))
+
+TRENDING_HALF_LIFE = float(os.getenv('TRENDING_HALF_LIFE', 48))
+
+TIMELINE_FANOUT_LIMIT = int(os.getenv('TIMELINE_FANOUT_LIMIT', 1000))
+TIMELINE_INBOX_SIZE = int(os.getenv('TIMELINE_INBOX_SIZE', 500))
+
+RECIPE_INDEX_PATH = os.getenv(
+    'RECIPE_INDEX_PATH', str(BASE_DIR / 'var' / 'recipe_index.bin')
+)
+RECIPE_INDEX_CHECK_INTERVAL = float(
+    os.getenv('RECIPE_INDEX_CHECK_INTERVAL', 2))
+RECIPE_INDEX_BACKGROUND_REBUILD = (
+    os.getenv('RECIPE_INDEX_BACKGROUND_REBUILD', 'True') == 'True'
+)
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -110,6 +175,19 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv('RECIPE_IMAGE_MAX_PIXELS', 40000000))
+RECIPE_IMAGE_MAX_DECODED_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_DECODED_SIZE', 10 * 1024 * 1024)
+)
+RECIPE_IMAGE_DECODE_WORKERS = int(os.getenv('RECIPE_IMAGE_DECODE_WORKERS', 2))
+RECIPE_IMAGE_DECODE_QUEUE_SIZE = int(
+    os.getenv('RECIPE_IMAGE_DECODE_QUEUE_SIZE', 4)
+)
+RECIPE_IMAGE_DECODE_TIMEOUT = float(
+    os.getenv('RECIPE_IMAGE_DECODE_TIMEOUT', 5)
+)
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
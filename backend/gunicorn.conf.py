@@ -0,0 +1,43 @@
+import os
+
+# SERVER_MODE=asgi запускает foodgram.asgi под воркерами uvicorn,
+# по умолчанию - foodgram.wsgi на синхронных воркерах.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+# Один воркер, как у gunicorn по умолчанию. У каждого воркера свои пулы
+# потоков и соединения с базой, поэтому число воркеров задаётся явно
+# с учётом max_connections PostgreSQL, см. get_max_connections.
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+
+def get_max_connections():
+    """Наибольшее число соединений с базой от всех воркеров.
+
+    С пулом воркер держит не больше DB_POOL_MAX_SIZE соединений.
+    Без пула соединение есть у каждого потока, который ходит в базу:
+    потока запросов (в режиме ASGI - ещё ASYNC_READ_THREADS потоков
+    чтения), RECIPE_IMAGE_WORKERS потоков картинок и потока
+    перестроения индекса рецептов.
+    """
+    if os.getenv('DB_POOL', 'False') == 'True':
+        per_worker = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    else:
+        per_worker = 1 + int(os.getenv('RECIPE_IMAGE_WORKERS', 2)) + 1
+        if SERVER_MODE == 'asgi':
+            per_worker += int(os.getenv('ASYNC_READ_THREADS', 8))
+    return workers * per_worker
+
+
+def when_ready(server):
+    server.log.info(
+        'Воркеров: %s, соединений с базой до %s',
+        workers, get_max_connections(),
+    )
@@ -0,0 +1,90 @@
+import threading
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+from foodgram.caches import is_shared
+
+from .models import Ingredient
+
+INDEX_VERSION_KEY = 'ingredients:index_version'
+FIELDS = ('id', 'name', 'measurement_unit')
+
+
+def search_database(query, limit=None):
+    """Тот же поиск, что и в индексе, запросами к базе."""
+    query = query.strip()
+    ingredients = Ingredient.objects.order_by(Lower('name'), 'id')
+    result = list(ingredients.filter(
+        name__istartswith=query).values(*FIELDS)[:limit])
+    if limit is not None and len(result) >= limit:
+        return result
+    contains = ingredients.filter(name__icontains=query).exclude(
+        name__istartswith=query).values(*FIELDS)
+    if limit is not None:
+        contains = contains[:limit - len(result)]
+    return result + list(contains)
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Названия хранятся отсортированным списком: совпадения по началу
+    названия находятся бинарным поиском, затем добавляются совпадения
+    по подстроке. Версия индекса хранится в кеше, чтобы изменение
+    ингредиентов в одном процессе сбрасывало индекс во всех остальных.
+    Если кеш не общий для процессов, индекс не строится и поиск идёт
+    запросами к базе.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._items = None
+        self._version = None
+
+    def _load(self):
+        version = cache.get(INDEX_VERSION_KEY)
+        items = sorted(
+            Ingredient.objects.values(*FIELDS),
+            key=lambda item: (item['name'].lower(), item['id']),
+        )
+        self._keys = [item['name'].lower() for item in items]
+        self._items = items
+        self._version = version
+
+    def _ensure_loaded(self):
+        if (self._items is not None
+                and self._version == cache.get(INDEX_VERSION_KEY)):
+            return
+        with self._lock:
+            self._load()
+
+    def invalidate(self):
+        self._items = None
+        try:
+            cache.incr(INDEX_VERSION_KEY)
+        except ValueError:
+            cache.set(INDEX_VERSION_KEY, 1, timeout=None)
+
+    def search(self, query, limit=None):
+        if not is_shared():
+            return search_database(query, limit)
+        self._ensure_loaded()
+        keys, items = self._keys, self._items
+        query = query.strip().lower()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\uffff', start)
+        result = items[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        for position, key in enumerate(keys):
+            if query in key and not start <= position < end:
+                result.append(items[position])
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+from .models import MAX_INGREDIENT_LENGHT, Ingredient
+
+READ_CHUNK_SIZE = 64 * 1024
+FORMATS = ('json', 'jsonl', 'csv')
+
+ingredients_imported = Signal()
+
+
+def read_json(file):
+    """Объекты JSON-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив')
+    position = 1
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError:
+                chunk = file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise
+                buffer = buffer[position:] + chunk
+                position = 0
+        yield item
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_rows(file, file_format):
+    """Пары (название, единица измерения) из файла в формате file_format."""
+    if file_format == 'csv':
+        for row in csv.reader(file):
+            yield tuple(row) if len(row) == 2 else (None, None)
+        return
+    reader = read_json if file_format == 'json' else read_jsonl
+    for item in reader(file):
+        yield item.get('name'), item.get('measurement_unit')
+
+
+def detect_format(path):
+    file_format = os.path.splitext(path)[1].lstrip('.').lower()
+    if file_format not in FORMATS:
+        raise ValueError(f'Неизвестный формат файла: {path}')
+    return file_format
+
+
+def clean_rows(rows, stats):
+    for name, measurement_unit in rows:
+        stats['read'] += 1
+        name = (name or '').strip()
+        measurement_unit = (measurement_unit or '').strip()
+        if (not name or not measurement_unit
+                or len(name) > MAX_INGREDIENT_LENGHT
+                or len(measurement_unit) > MAX_INGREDIENT_LENGHT):
+            stats['invalid'] += 1
+            continue
+        yield name, measurement_unit
+
+
+def insert_with_copy(batch):
+    """Загружает пачку через COPY во временную таблицу.
+
+    Возвращает число добавленных строк: дубликаты отбрасывает
+    ON CONFLICT по ограничению unique_ingredient.
+    """
+    table = Ingredient._meta.db_table
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(batch)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE IF NOT EXISTS ingredient_import '
+            '(name text, measurement_unit text) ON COMMIT DELETE ROWS'
+        )
+        cursor.copy_expert(
+            'COPY ingredient_import (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            'SELECT name, measurement_unit FROM ingredient_import '
+            'ON CONFLICT ON CONSTRAINT unique_ingredient DO NOTHING'
+        )
+        inserted = cursor.rowcount
+        cursor.execute('DELETE FROM ingredient_import')
+    return inserted
+
+
+def insert_with_bulk_create(batch):
+    Ingredient.objects.bulk_create(
+        (Ingredient(name=name, measurement_unit=measurement_unit)
+         for name, measurement_unit in batch),
+        ignore_conflicts=True,
+    )
+
+
+def import_ingredients(file, file_format, batch_size=1000, use_copy=True):
+    """Добавляет ингредиенты из файла пачками по batch_size строк.
+
+    Файл читается потоково, поэтому память не зависит от его размера.
+    На PostgreSQL используется COPY, иначе bulk_create с пропуском
+    дубликатов. Возвращает счётчики read, inserted, skipped и invalid.
+    """
+    stats = {'read': 0, 'inserted': 0, 'skipped': 0, 'invalid': 0}
+    use_copy = use_copy and connection.vendor == 'postgresql'
+    rows = clean_rows(read_rows(file, file_format), stats)
+    with transaction.atomic():
+        before = 0 if use_copy else Ingredient.objects.count()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            if use_copy:
+                stats['inserted'] += insert_with_copy(batch)
+            else:
+                insert_with_bulk_create(batch)
+        if not use_copy:
+            stats['inserted'] = Ingredient.objects.count() - before
+    stats['skipped'] = stats['read'] - stats['invalid'] - stats['inserted']
+    if stats['inserted']:
+        ingredients_imported.send(sender=Ingredient)
+    return stats
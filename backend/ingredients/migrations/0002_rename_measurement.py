@@ -0,0 +1,26 @@
+# Generated by Django 3.2.1 on 2026-10-18 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ingredient',
+            name='unique_ingredient',
+        ),
+        migrations.RenameField(
+            model_name='ingredient',
+            old_name='measurement',
+            new_name='measurement_unit',
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
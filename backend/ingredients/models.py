@@ -1,6 +1,10 @@
 from django.db import models
 
 MAX_INGREDIENT_LENGHT = 200
+NORMALIZED_UNITS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+}
 
 
 class Ingredient(models.Model):
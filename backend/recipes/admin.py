@@ -1,19 +1,24 @@
 from django.contrib import admin
+from django.utils.html import format_html
+
+from .images import build_thumbnail_urls
 from .models import Recipe
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'text', 'image', 'cooking_time')
+    list_display = ('id', 'name', 'author', 'text', 'preview', 'cooking_time',
+                    'favorites_count', 'shopping_cart_count')
     search_fields = ('name', 'tags__name')
     list_filter = ('name', 'tags__name')
     ordering = ('name',)
     empty_value_display = '-пусто-'
 
-    def tag_count(self, obj):
-        return obj.tags.count()
-
-    def ingredient_count(self, obj):
-        return obj.ingredients.count()
+    @admin.display(description='Картинка')
+    def preview(self, obj):
+        urls = build_thumbnail_urls(obj.thumbnails).get('admin')
+        if not urls:
+            return obj.image or self.empty_value_display
+        return format_html('<img src="{}" alt="">', urls['jpeg'])
 
 
 admin.site.register(Recipe, RecipeAdmin)
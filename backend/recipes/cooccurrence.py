@@ -0,0 +1,112 @@
+"""Рецепты, которые пользователи добавляют вместе с данным.
+
+Взаимодействия пользователь × рецепт (избранное и списки покупок)
+образуют разреженную матрицу A. Совместная встречаемость рецептов -
+произведение AᵀA; оно считается в PostgreSQL соединением таблицы
+взаимодействий с собой по пользователю, порциями по диапазону id
+рецептов. На порцию приходится одна агрегация в базе, поэтому память
+не зависит от числа избранного. Сходство нормируется по косинусу:
+вместе / sqrt(число пользователей у первого × у второго), и для
+каждого рецепта сохраняются top_k соседей.
+"""
+from django.db import connection, transaction
+
+from favorite.models import Favorite
+from shoppingcart.models import ShoppingCart
+
+from .models import Recipe, RecipeNeighbour
+
+INTERACTIONS = 'recipe_interactions'
+COUNTS = 'recipe_interaction_counts'
+
+
+def create_interactions(max_user_items):
+    """Временные таблицы взаимодействий и числа пользователей рецепта.
+
+    Пользователи, у которых больше max_user_items рецептов, дают
+    квадратичное число пар и почти не несут сигнала, их не учитываем.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {INTERACTIONS}, {COUNTS}')
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {INTERACTIONS} AS '
+            f'SELECT user_id, recipe_id FROM {Favorite._meta.db_table} '
+            'UNION '
+            f'SELECT user_id, recipe_id FROM {ShoppingCart._meta.db_table}'
+        )
+        cursor.execute(
+            f'DELETE FROM {INTERACTIONS} WHERE user_id IN ('
+            f'SELECT user_id FROM {INTERACTIONS} '
+            'GROUP BY user_id HAVING count(*) > %s)',
+            (max_user_items,),
+        )
+        cursor.execute(
+            f'CREATE INDEX ON {INTERACTIONS} (recipe_id, user_id)')
+        cursor.execute(
+            f'CREATE INDEX ON {INTERACTIONS} (user_id, recipe_id)')
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {COUNTS} AS '
+            f'SELECT recipe_id, count(*) AS users FROM {INTERACTIONS} '
+            'GROUP BY recipe_id'
+        )
+        cursor.execute(f'CREATE UNIQUE INDEX ON {COUNTS} (recipe_id)')
+        cursor.execute(f'ANALYZE {INTERACTIONS}')
+        cursor.execute(f'ANALYZE {COUNTS}')
+
+
+def store_chunk(start, end, top_k, min_support):
+    """Заменяет соседей рецептов с id из [start, end)."""
+    table = RecipeNeighbour._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE recipe_id >= %s AND recipe_id < %s',
+            (start, end),
+        )
+        cursor.execute(
+            'WITH pairs AS ('
+            'SELECT a.recipe_id, b.recipe_id AS neighbour_id, '
+            'count(*) AS together '
+            f'FROM {INTERACTIONS} a JOIN {INTERACTIONS} b '
+            'ON b.user_id = a.user_id AND b.recipe_id <> a.recipe_id '
+            'WHERE a.recipe_id >= %s AND a.recipe_id < %s '
+            'GROUP BY a.recipe_id, b.recipe_id '
+            'HAVING count(*) >= %s'
+            '), scored AS ('
+            'SELECT pairs.recipe_id, pairs.neighbour_id, '
+            'pairs.together / sqrt(a.users * b.users) AS score '
+            f'FROM pairs JOIN {COUNTS} a ON a.recipe_id = pairs.recipe_id '
+            f'JOIN {COUNTS} b ON b.recipe_id = pairs.neighbour_id'
+            '), ranked AS ('
+            'SELECT *, row_number() OVER (PARTITION BY recipe_id '
+            'ORDER BY score DESC, neighbour_id DESC) AS rank FROM scored'
+            ') '
+            f'INSERT INTO {table} (recipe_id, neighbour_id, score) '
+            'SELECT recipe_id, neighbour_id, score FROM ranked '
+            'WHERE rank <= %s',
+            (start, end, min_support, top_k),
+        )
+        return cursor.rowcount
+
+
+def compute_neighbours(top_k=20, chunk_size=1000, min_support=2,
+                       max_user_items=500):
+    """Пересчитывает RecipeNeighbour для всех рецептов.
+
+    Каждая порция из chunk_size id рецептов заменяется в своей
+    транзакции, поэтому во время пересчёта читаются старые или уже
+    новые соседи, но не пустота. Возвращает число сохранённых пар.
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    create_interactions(max_user_items)
+    last_id = Recipe.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+    stored = 0
+    try:
+        for start in range(0, last_id + 1, chunk_size):
+            stored += store_chunk(
+                start, start + chunk_size, top_k, min_support)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {INTERACTIONS}, {COUNTS}')
+    return stored
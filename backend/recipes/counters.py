@@ -0,0 +1,44 @@
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+COUNTERS = (
+    ('recipes.Recipe', 'favorites_count', 'favorite.Favorite', 'recipe'),
+    ('recipes.Recipe', 'shopping_cart_count',
+     'shoppingcart.ShoppingCart', 'recipe'),
+    ('users.CustomUser', 'followers_count', 'users.FollowUser', 'author'),
+    ('users.CustomUser', 'recipes_count', 'recipes.Recipe', 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик строки pk на delta, не уходя ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, Value(0))}
+    )
+
+
+def reconcile_counters(apps=global_apps, dry_run=False):
+    """Пересчитывает счётчики, разошедшиеся с числом связанных строк.
+
+    Счётчики меняются в представлениях, а удаления каскадом и правки
+    в админке их не трогают. Возвращает {(модель, поле): число
+    исправленных строк}. apps позволяет вызывать пересчёт из миграций.
+    """
+    fixed = {}
+    for model_name, field, related_name, foreign_key in COUNTERS:
+        model = apps.get_model(model_name)
+        related = apps.get_model(related_name)
+        actual = Coalesce(Subquery(
+            related.objects.filter(**{foreign_key: OuterRef('pk')})
+            .order_by().values(foreign_key)
+            .annotate(count=Count('*')).values('count')
+        ), 0)
+        drifted = model.objects.annotate(actual=actual).exclude(
+            **{field: F('actual')})
+        fixed[model_name, field] = (
+            drifted.count() if dry_run
+            else model.objects.filter(
+                pk__in=drifted.values('pk')).update(**{field: actual})
+        )
+    return fixed
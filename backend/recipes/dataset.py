@@ -0,0 +1,192 @@
+import random
+from collections import namedtuple
+from itertools import accumulate
+
+from favorite.models import Favorite
+from ingredients.models import Ingredient
+from shoppingcart.models import ShoppingCart, ShoppingCartIngredient
+from tag.models import Tag
+from users.models import CustomUser, FollowUser
+
+from .counters import reconcile_counters
+from .models import Recipe, RecipeIngredients
+from .recommendations import recipe_index
+from .search import update_search_vector
+from .trending import update_trending_scores
+
+BATCH_SIZE = 1000
+POWER_LAW_EXPONENT = 1.1
+UNITS = ('г', 'мл', 'шт.', 'ст. л.', 'ч. л.', 'кг', 'л', 'по вкусу')
+WORDS = (
+    'суп', 'салат', 'паста', 'пирог', 'каша', 'рагу', 'запеканка',
+    'курица', 'говядина', 'рыба', 'грибы', 'сыр', 'томаты', 'картофель',
+    'быстрый', 'домашний', 'острый', 'летний', 'праздничный', 'постный',
+)
+
+Dataset = namedtuple('Dataset', 'users tags ingredients recipes')
+
+
+class DatasetGenerator:
+    """Синтетические данные со степенным распределением популярности.
+
+    Немногие авторы пишут большую часть рецептов, а избранное, списки
+    покупок и подписки сосредоточены на популярных рецептах и авторах,
+    как в настоящем сервисе. При одном seed данные воспроизводятся.
+    """
+
+    def __init__(self, seed=0, prefix='synthetic'):
+        self.random = random.Random(seed)
+        self.prefix = prefix
+
+    def prefix_taken(self):
+        """Есть ли уже в базе данные с этим префиксом."""
+        return (
+            CustomUser.objects.filter(
+                username__startswith=f'{self.prefix}_user_').exists()
+            or Tag.objects.filter(
+                name__startswith=f'{self.prefix}_tag_').exists()
+        )
+
+    def power_law_weights(self, count):
+        weights = [1 / (rank ** POWER_LAW_EXPONENT)
+                   for rank in range(1, count + 1)]
+        self.random.shuffle(weights)
+        return list(accumulate(weights))
+
+    def sample_count(self, mean, limit):
+        """Число связей пользователя: в среднем mean, с длинным хвостом."""
+        return min(limit, int(mean * self.random.paretovariate(2) / 2))
+
+    def sample(self, population, cum_weights, count):
+        chosen = self.random.choices(
+            population, cum_weights=cum_weights, k=count)
+        return list(dict.fromkeys(chosen))
+
+    def bulk_create(self, model, objects):
+        """bulk_create с первичными ключами на любой базе.
+
+        В Django 3.2 только PostgreSQL возвращает ключи из bulk_create,
+        на SQLite они берутся как последние добавленные: генератор
+        запускается без параллельной записи.
+        """
+        objects = model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+        if objects and objects[0].pk is None:
+            pks = model.objects.order_by('-pk').values_list(
+                'pk', flat=True)[:len(objects)]
+            for obj, pk in zip(objects, reversed(pks)):
+                obj.pk = pk
+        return objects
+
+    def text(self, words):
+        return ' '.join(self.random.sample(WORDS, words))
+
+    def create_users(self, count):
+        return self.bulk_create(CustomUser, [
+            CustomUser(username=f'{self.prefix}_user_{i}',
+                       email=f'{self.prefix}_user_{i}@example.com',
+                       first_name='Synthetic', last_name=f'User{i}')
+            for i in range(count)
+        ])
+
+    def sample_colors(self, count):
+        """Случайные цвета, которых ещё нет у тегов в базе.
+
+        Цвет тега уникален, а последовательность цветов зависит только
+        от seed: без проверки второй набор с тем же seed и другим
+        префиксом падал бы на первом же совпадении.
+        """
+        taken = {color.lower()
+                 for color in Tag.objects.values_list('color', flat=True)}
+        colors = []
+        while len(colors) < count:
+            color = f'#{self.random.randrange(1 << 24):06x}'
+            if color not in taken:
+                taken.add(color)
+                colors.append(color)
+        return colors
+
+    def create_tags(self, count):
+        return self.bulk_create(Tag, [
+            Tag(name=f'{self.prefix}_tag_{i}', color=color,
+                slug=f'{self.prefix}-tag-{i}')
+            for i, color in enumerate(self.sample_colors(count))
+        ])
+
+    def create_ingredients(self, count):
+        return self.bulk_create(Ingredient, [
+            Ingredient(name=f'{self.prefix} {self.text(2)} {i}',
+                       measurement_unit=self.random.choice(UNITS))
+            for i in range(count)
+        ])
+
+    def create_recipes(self, count, users, tags, ingredients):
+        rng = self.random
+        authors = self.power_law_weights(len(users))
+        recipes = self.bulk_create(Recipe, [
+            Recipe(name=f'{self.text(2)} {i}'.capitalize(),
+                   author=rng.choices(users, cum_weights=authors)[0],
+                   text=self.text(8),
+                   cooking_time=max(1, int(rng.lognormvariate(3.4, 0.6))))
+            for i in range(count)
+        ])
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe=recipe, tag=tag)
+             for recipe in recipes
+             for tag in rng.sample(tags, rng.randint(1, min(3, len(tags))))),
+            batch_size=BATCH_SIZE,
+        )
+        popular_ingredients = self.power_law_weights(len(ingredients))
+        RecipeIngredients.objects.bulk_create(
+            (RecipeIngredients(recipe=recipe, ingredient=ingredient,
+                               amount=rng.randint(1, 500))
+             for recipe in recipes
+             for ingredient in self.sample(
+                 ingredients, popular_ingredients, rng.randint(3, 12))),
+            batch_size=BATCH_SIZE,
+        )
+        for start in range(0, len(recipes), BATCH_SIZE):
+            update_search_vector(
+                [recipe.pk for recipe in recipes[start:start + BATCH_SIZE]])
+        return recipes
+
+    def create_links(self, users, recipes, favorites, carts, follows):
+        popular_recipes = self.power_law_weights(len(recipes))
+        for model, mean in ((Favorite, favorites), (ShoppingCart, carts)):
+            model.objects.bulk_create(
+                (model(user=user, recipe=recipe)
+                 for user in users
+                 for recipe in self.sample(
+                     recipes, popular_recipes,
+                     self.sample_count(mean, len(recipes)))),
+                batch_size=BATCH_SIZE,
+            )
+        popular_authors = self.power_law_weights(len(users))
+        FollowUser.objects.bulk_create(
+            (FollowUser(user=user, author=author)
+             for user in users
+             for author in self.sample(
+                 users, popular_authors,
+                 self.sample_count(follows, len(users)))
+             if author != user),
+            batch_size=BATCH_SIZE,
+        )
+        ShoppingCartIngredient.objects.rebuild()
+
+    def generate(self, users=1000, recipes=10000, tags=10, ingredients=2000,
+                 favorites=20, carts=5, follows=10):
+        """Создаёт набор данных заданного размера.
+
+        favorites, carts и follows - среднее число связей на пользователя.
+        """
+        user_objects = self.create_users(users)
+        tag_objects = self.create_tags(tags)
+        ingredient_objects = self.create_ingredients(ingredients)
+        recipe_objects = self.create_recipes(
+            recipes, user_objects, tag_objects, ingredient_objects)
+        self.create_links(
+            user_objects, recipe_objects, favorites, carts, follows)
+        reconcile_counters()
+        update_trending_scores()
+        recipe_index.invalidate()
+        return Dataset(
+            user_objects, tag_objects, ingredient_objects, recipe_objects)
@@ -0,0 +1,134 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+THUMBNAIL_SIZES = {
+    'admin': (160, 120),
+    'card': (480, 360),
+    'detail': (1200, 900),
+}
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+THUMBNAILS_DIR = 'recipes/thumbnails'
+
+logger = logging.getLogger(__name__)
+
+thumbnails_updated = Signal()
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+    return _executor
+
+
+def get_thumbnail_name(source, size, extension):
+    root, _ = os.path.splitext(os.path.basename(source))
+    return f'{THUMBNAILS_DIR}/{root}_{size}.{extension}'
+
+
+def render_thumbnails(source):
+    """Уменьшенные копии картинки для всех размеров и форматов.
+
+    Копии сохраняются заново без EXIF и других метаданных, ориентация
+    из EXIF применяется к пикселям до уменьшения.
+    """
+    with default_storage.open(source) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    thumbnails = {'source': source}
+    for size, box in THUMBNAIL_SIZES.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail(box, Image.LANCZOS)
+        thumbnails[size] = {}
+        for extension, (image_format, options) in THUMBNAIL_FORMATS.items():
+            buffer = BytesIO()
+            thumbnail.save(buffer, image_format, **options)
+            thumbnails[size][extension] = default_storage.save(
+                get_thumbnail_name(source, size, extension),
+                ContentFile(buffer.getvalue()),
+            )
+    return thumbnails
+
+
+def get_thumbnail_files(thumbnails):
+    return [
+        name
+        for size in THUMBNAIL_SIZES
+        for name in thumbnails.get(size, {}).values()
+    ]
+
+
+def process_recipe_image(recipe_id):
+    """Пересобирает уменьшенные копии картинки рецепта.
+
+    Копии записываются, только если картинка не сменилась за время
+    обработки; файлы прежних копий удаляются.
+    """
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).only(
+            'author', 'image', 'thumbnails').first()
+        if recipe is None:
+            return
+        source = recipe.image.name
+        thumbnails = render_thumbnails(source) if source else {}
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=source
+        ).update(thumbnails=thumbnails)
+        if updated:
+            thumbnails_updated.send(sender=Recipe, instance=recipe)
+        obsolete = get_thumbnail_files(recipe.thumbnails if updated
+                                       else thumbnails)
+        for name in obsolete:
+            default_storage.delete(name)
+    except Exception:
+        logger.exception('Не удалось обработать картинку рецепта %s',
+                         recipe_id)
+    finally:
+        if settings.RECIPE_IMAGE_WORKERS:
+            connection.close()
+
+
+def schedule_recipe_image(recipe_id):
+    """Ставит обработку картинки в пул после фиксации транзакции.
+
+    При RECIPE_IMAGE_WORKERS = 0 обработка идёт в текущем потоке.
+    """
+    def submit():
+        if settings.RECIPE_IMAGE_WORKERS:
+            get_executor().submit(process_recipe_image, recipe_id)
+        else:
+            process_recipe_image(recipe_id)
+
+    transaction.on_commit(submit)
+
+
+def build_thumbnail_urls(thumbnails, request=None):
+    urls = {}
+    for size in THUMBNAIL_SIZES:
+        if size not in thumbnails:
+            continue
+        urls[size] = {}
+        for extension, name in thumbnails[size].items():
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[size][extension] = url
+    return urls
@@ -0,0 +1,192 @@
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+import uuid
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes.dataset import WORDS, DatasetGenerator
+from users.models import CustomUser
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт набор данных в откатываемой транзакции и замеряет '
+        'задержку, число запросов и память для эндпоинтов API.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='write JSON results to a file')
+        parser.add_argument(
+            '--compare', help='JSON results of a previous run to diff with',
+        )
+
+    def get_endpoints(self, dataset):
+        """Эндпоинты с параметрами для самого активного пользователя."""
+        user = CustomUser.objects.filter(
+            pk__in=[user.pk for user in dataset.users]
+        ).annotate(
+            carts=Count('shoppingcart', distinct=True),
+            follows=Count('follower', distinct=True),
+        ).order_by('-carts', '-follows').first()
+        recipe = dataset.recipes[len(dataset.recipes) // 2]
+        tag = dataset.tags[0]
+        token = Token.objects.create(user=user).key
+        return user, token, {
+            'recipes': ('/api/recipes/', True),
+            'recipes (anonymous)': ('/api/recipes/', False),
+            'recipes by tag': (f'/api/recipes/?tags={tag.slug}', True),
+            'recipes by author': (
+                f'/api/recipes/?author={recipe.author_id}', True),
+            'favorited recipes': ('/api/recipes/?is_favorited=1', True),
+            'recipe search': (f'/api/recipes/?search={WORDS[0]}', True),
+            'recipe detail': (f'/api/recipes/{recipe.pk}/', True),
+            'subscriptions': (
+                '/api/users/subscriptions/?recipes_limit=3', True),
+            'download shopping cart': (
+                '/api/recipes/download_shopping_cart/', True),
+            'shopping cart summary': (
+                '/api/recipes/shopping_cart_summary/', True),
+            'users': ('/api/users/', True),
+            'tags': ('/api/tags/', False),
+            'ingredient autocomplete': (
+                f'/api/ingredients/?name={dataset.ingredients[0].name[:12]}',
+                False),
+        }
+
+    def request(self, client, url, headers):
+        response = client.get(url, **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, client, url, headers, iterations):
+        """Задержка, число запросов к базе и пик памяти эндпоинта.
+
+        Задержка меряется по iterations запросам, а запросы и память -
+        по одному отдельному запросу, чтобы tracemalloc не искажал время.
+        """
+        self.request(client, url, headers)
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            self.request(client, url, headers)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.request(client, url, headers)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'status': response.status_code,
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'queries': len(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def get_cache_settings(self):
+        """Кеши с отдельным префиксом ключей для этого запуска.
+
+        Набор данных откатывается, поэтому закешированные по нему ответы
+        не должны попасть к серверу, который работает с тем же кешем,
+        а чистить общий кеш целиком нельзя.
+        """
+        prefix = f'benchmark-{uuid.uuid4().hex}'
+        return {
+            alias: {**options, 'KEY_PREFIX': prefix}
+            for alias, options in settings.CACHES.items()
+        }
+
+    def run(self, options):
+        with override_settings(CACHES=self.get_cache_settings()), \
+                transaction.atomic():
+            dataset = DatasetGenerator(
+                options['seed'], prefix=f'bench_{uuid.uuid4().hex[:8]}'
+            ).generate(users=options['users'], recipes=options['recipes'])
+            user, token, endpoints = self.get_endpoints(dataset)
+            client = Client()
+            results = {}
+            for name, (url, authenticated) in endpoints.items():
+                headers = (
+                    {'HTTP_AUTHORIZATION': f'Token {token}'}
+                    if authenticated else {}
+                )
+                results[name] = self.measure(
+                    client, url, headers, options['iterations'])
+            transaction.set_rollback(True)
+        return {
+            'meta': {
+                'commit': get_commit(),
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'users': options['users'],
+                'recipes': options['recipes'],
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+            },
+            'endpoints': results,
+        }
+
+    def compare(self, results, path):
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)['endpoints']
+        for name, result in results['endpoints'].items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            change = (
+                (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+                if before['p50_ms'] else 0
+            )
+            self.stdout.write(
+                f'{name}: p50 {before["p50_ms"]} -> {result["p50_ms"]} мс '
+                f'({change:+.0f}%), запросов {before["queries"]} -> '
+                f'{result["queries"]}'
+            )
+
+    def handle(self, *args, **options):
+        results = self.run(options)
+        output = json.dumps(results, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            self.compare(results, options['compare'])
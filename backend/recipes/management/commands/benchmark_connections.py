@@ -0,0 +1,96 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from foodgram.db.pool.base import DatabaseWrapper as PoolDatabaseWrapper
+
+MODES = ('fresh', 'persistent', 'pool')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время запроса списка рецептов с новым соединением '
+        'на каждый запрос, постоянным соединением и пулом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--url', default='/api/recipes/?is_favorited=0')
+        parser.add_argument(
+            '--json', action='store_true',
+            help='print the result as a JSON object',
+        )
+
+    def use_connection(self, mode, settings_dict):
+        settings_dict = {
+            **settings_dict,
+            'CONN_MAX_AGE': 0 if mode in ('fresh', 'pool') else 600,
+        }
+        connections['default'].close()
+        if mode == 'pool':
+            connections['default'] = PoolDatabaseWrapper(
+                settings_dict, 'default')
+        else:
+            connections['default'] = type(connections['default'])(
+                settings_dict, 'default')
+
+    def measure(self, url, count):
+        """Время запросов и число новых соединений за count запросов.
+
+        Тестовый клиент не закрывает соединения по сигналам запроса,
+        поэтому close_old_connections вызывается здесь, как в обработчике.
+        """
+        client = Client()
+        connects = []
+
+        def count_connect(sender, connection, **kwargs):
+            connects.append(connection.alias)
+
+        connection_created.connect(count_connect)
+        client.get(url)
+        close_old_connections()
+        connects.clear()
+        timings = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                close_old_connections()
+                client.get(url)
+                close_old_connections()
+                timings.append(time.perf_counter() - started)
+        finally:
+            connection_created.disconnect(count_connect)
+        timings.sort()
+        return {
+            'mean_ms': round(sum(timings) / count * 1000, 2),
+            'p50_ms': round(timings[count // 2] * 1000, 2),
+            'connects': len(connects),
+        }
+
+    def handle(self, *args, **options):
+        original = connections['default']
+        settings_dict = original.settings_dict
+        result = {}
+        try:
+            for mode in MODES:
+                self.use_connection(mode, settings_dict)
+                result[mode] = self.measure(
+                    options['url'], options['requests'])
+        finally:
+            connections['default'].close()
+            connections['default'] = original
+        result['connect_overhead_ms'] = round(
+            result['fresh']['mean_ms'] - result['persistent']['mean_ms'], 2)
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+            return
+        for mode in MODES:
+            self.stdout.write(f'{mode}: {result[mode]}')
+        self.stdout.write(
+            f'Накладные расходы соединения на запрос: '
+            f'{result["connect_overhead_ms"]} мс'
+        )
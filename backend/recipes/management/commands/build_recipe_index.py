@@ -0,0 +1,18 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.recommendations import recipe_index
+
+
+class Command(BaseCommand):
+    help = 'Строит индекс ингредиентов рецептов для рекомендаций.'
+
+    def handle(self, *args, **options):
+        matrix = recipe_index.rebuild().matrix
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов: {len(matrix.recipe_ids)}, '
+            f'связей: {len(matrix.indices)}, '
+            f'файл: {os.path.getsize(settings.RECIPE_INDEX_PATH) // 1024} КБ.'
+        ))
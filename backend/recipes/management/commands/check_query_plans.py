@@ -0,0 +1,49 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.cooccurrence import compute_neighbours
+from recipes.dataset import DatasetGenerator
+from recipes.query_plans import (
+    explain, find_plan_problems, get_hot_queries,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу тестовыми данными в откатываемой транзакции и '
+        'проверяет через EXPLAIN, что горячие запросы используют свои индексы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Проверка планов доступна только в PostgreSQL.')
+        with transaction.atomic():
+            users, tags, _, recipes = DatasetGenerator(
+                options['seed'], prefix=f'plan_{uuid.uuid4().hex[:8]}'
+            ).generate(users=options['users'], recipes=options['recipes'])
+            compute_neighbours(min_support=1)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            queries = get_hot_queries(
+                users[0], users[1], tags[0], recipes[len(recipes) // 2])
+            failures = []
+            for name, queryset in queries.items():
+                problems = find_plan_problems(name, explain(queryset))
+                if problems:
+                    failures.append(f'{name}: {", ".join(problems)}')
+                    self.stdout.write(self.style.ERROR(failures[-1]))
+                else:
+                    self.stdout.write(f'{name}: OK')
+            transaction.set_rollback(True)
+        if failures:
+            raise CommandError(
+                'Регрессии планов запросов: ' + '; '.join(failures))
+        self.stdout.write(
+            self.style.SUCCESS('Все запросы используют индексы.'))
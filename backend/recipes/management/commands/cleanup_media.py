@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import THUMBNAILS_DIR, get_thumbnail_files
+from recipes.models import Recipe
+from recipes.storage import get_refcounts
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки рецептов, на которые не осталось ссылок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='only report orphaned files',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='skip files younger than this many seconds',
+        )
+
+    def find_orphans(self, min_age):
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        referenced = set(get_refcounts(field))
+        for thumbnails in Recipe.objects.values_list(
+                'thumbnails', flat=True).iterator():
+            referenced.update(get_thumbnail_files(thumbnails))
+        directory = field.upload_to.rstrip('/')
+        candidates = list(storage.list_blobs(directory))
+        if storage.exists(directory):
+            candidates.extend(
+                f'{directory}/{name}' for name in storage.listdir(directory)[1]
+            )
+        if default_storage.exists(THUMBNAILS_DIR):
+            candidates.extend(
+                f'{THUMBNAILS_DIR}/{name}'
+                for name in default_storage.listdir(THUMBNAILS_DIR)[1]
+            )
+        threshold = timezone.now() - timedelta(seconds=min_age)
+        return [
+            name for name in candidates
+            if name not in referenced
+            and storage.get_modified_time(name) < threshold
+        ]
+
+    def handle(self, *args, **options):
+        orphans = self.find_orphans(options['min_age'])
+        storage = Recipe._meta.get_field('image').storage
+        freed = 0
+        for name in orphans:
+            freed += storage.size(name)
+            if not options['dry_run']:
+                storage.delete(name)
+            self.stdout.write(name)
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов без ссылок: {len(orphans)}, '
+            f'{freed // 1024} КБ.'
+        ))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.cooccurrence import compute_neighbours
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рецепты, которые добавляют в избранное и списки '
+        'покупок вместе с данным.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int, default=20,
+            help='neighbours stored per recipe',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='recipe ids processed per query and transaction',
+        )
+        parser.add_argument(
+            '--min-support', type=int, default=2,
+            help='minimum number of users shared by two recipes',
+        )
+        parser.add_argument(
+            '--max-user-items', type=int, default=500,
+            help='skip users with more favorites and cart recipes',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Пересчёт доступен только в PostgreSQL.')
+        started = time.perf_counter()
+        stored = compute_neighbours(
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            min_support=options['min_support'],
+            max_user_items=options['max_user_items'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено пар: {stored} '
+            f'за {time.perf_counter() - started:.1f} с.'
+        ))
@@ -1,26 +1,37 @@
-import json
+from django.core.management.base import BaseCommand, CommandError
 
-from django.core.management.base import BaseCommand
-
-from recipes.models import Ingredient
+from ingredients.importer import FORMATS, detect_format, import_ingredients
 
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из файла JSON, JSONL или CSV.'
 
     def add_arguments(self, parser):
         parser.add_argument("--path", type=str, help="file path")
+        parser.add_argument(
+            "--format", choices=FORMATS,
+            help="file format, detected from the extension by default",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--no-copy", action="store_true",
+            help="use bulk_create instead of COPY on PostgreSQL",
+        )
 
     def handle(self, *args, **options):
         file_path = options["path"]
-
-        with open(file_path, encoding='utf-8') as f:
-            jsondata = json.load(f)
-            if 'measurement_unit' in jsondata[0]:
-                for line in jsondata:
-                    if not Ingredient.objects.filter(
-                       name=line['name'],
-                       measurement_unit=line['measurement_unit']).exists():
-                        Ingredient.objects.create(
-                            name=line['name'],
-                            measurement_unit=line['measurement_unit']
-                        )
+        try:
+            file_format = options["format"] or detect_format(file_path)
+            with open(file_path, encoding='utf-8', newline='') as f:
+                stats = import_ingredients(
+                    f, file_format,
+                    batch_size=options["batch_size"],
+                    use_copy=not options["no_copy"],
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано: {stats["read"]}, добавлено: {stats["inserted"]}, '
+            f'пропущено дубликатов: {stats["skipped"]}, '
+            f'некорректных строк: {stats["invalid"]}.'
+        ))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ingredients.importer import ingredients_imported
+from ingredients.models import Ingredient
+from recipes.dataset import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетический набор данных: пользователей, рецепты, теги, '
+        'ингредиенты, избранное, списки покупок и подписки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='average favorites per user',
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='average shopping cart recipes per user',
+        )
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='average subscriptions per user',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic')
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(options['seed'], options['prefix'])
+        if generator.prefix_taken():
+            raise CommandError(
+                f'Данные с префиксом {options["prefix"]} уже есть в базе, '
+                'укажите другой --prefix.'
+            )
+        with transaction.atomic():
+            dataset = generator.generate(
+                users=options['users'],
+                recipes=options['recipes'],
+                tags=options['tags'],
+                ingredients=options['ingredients'],
+                favorites=options['favorites'],
+                carts=options['carts'],
+                follows=options['follows'],
+            )
+        ingredients_imported.send(sender=Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(dataset.users)}, '
+            f'рецептов: {len(dataset.recipes)}, '
+            f'тегов: {len(dataset.tags)}, '
+            f'ингредиентов: {len(dataset.ingredients)}.'
+        ))
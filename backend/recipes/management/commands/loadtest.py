@@ -0,0 +1,116 @@
+import json
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер параллельными GET-запросами и '
+        'выводит пропускную способность и перцентили задержки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='connections that upload a request body byte by byte',
+        )
+        parser.add_argument(
+            '--slow-url',
+            help='endpoint that reads the body, for slow clients',
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='print the result as a JSON object',
+        )
+
+    def run_client(self, urls, deadline, timeout, latencies, errors):
+        session = requests.Session()
+        position = 0
+        while time.monotonic() < deadline:
+            url = urls[position % len(urls)]
+            position += 1
+            started = time.monotonic()
+            try:
+                response = session.get(url, timeout=timeout)
+                failed = response.status_code >= 500
+            except requests.RequestException:
+                failed = True
+            if failed:
+                errors.append(url)
+            else:
+                latencies.append(time.monotonic() - started)
+
+    def run_slow_client(self, url, deadline):
+        """Медленная загрузка: тело запроса приходит по байту в секунду."""
+        parts = urlsplit(url)
+        with socket.create_connection((parts.hostname, parts.port or 80)) as (
+                connection):
+            connection.sendall(
+                f'POST {parts.path} HTTP/1.1\r\n'
+                f'Host: {parts.netloc}\r\n'
+                'Content-Type: application/json\r\n'
+                'Content-Length: 1000000\r\n\r\n'.encode()
+            )
+            while time.monotonic() < deadline:
+                try:
+                    connection.sendall(b' ')
+                except OSError:
+                    return
+                time.sleep(1)
+
+    def handle(self, *args, **options):
+        latencies, errors = [], []
+        deadline = time.monotonic() + options['duration']
+        clients = [
+            threading.Thread(target=self.run_client, args=(
+                options['urls'], deadline, options['timeout'],
+                latencies, errors,
+            ))
+            for _ in range(options['concurrency'])
+        ]
+        clients.extend(
+            threading.Thread(target=self.run_slow_client, args=(
+                options['slow_url'] or options['urls'][0], deadline,
+            ), daemon=True)
+            for _ in range(options['slow_clients'])
+        )
+        started = time.monotonic()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.monotonic() - started
+        if not latencies:
+            raise CommandError(f'Нет успешных ответов, ошибок: {len(errors)}')
+        latencies.sort()
+        result = {
+            'concurrency': options['concurrency'],
+            'slow_clients': options['slow_clients'],
+            'requests': len(latencies),
+            'errors': len(errors),
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+            return
+        for key, value in result.items():
+            self.stdout.write(f'{key}: {value}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Исправляет разошедшиеся счётчики рецептов и пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='only report rows with drifted counters',
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters(dry_run=options['dry_run'])
+        for (model, field), count in fixed.items():
+            self.stdout.write(f'{model}.{field}: {count}')
+        action = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} строк с неверными счётчиками: {sum(fixed.values())}.'
+        ))
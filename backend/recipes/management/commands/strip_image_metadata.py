@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from recipes.images import schedule_recipe_image
+from recipes.models import Recipe
+from recipes.metadata import has_metadata
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересохраняет без метаданных картинки рецептов, загруженные '
+        'до их очистки. Старые файлы удаляет cleanup_media.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='only report images with metadata',
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        names = Recipe.objects.exclude(image='').order_by().values_list(
+            'image', flat=True).distinct()
+        stripped = 0
+        for name in names.iterator():
+            with storage.open(name) as file:
+                with Image.open(file) as image:
+                    if not has_metadata(image):
+                        continue
+                stripped += 1
+                if options['dry_run']:
+                    self.stdout.write(name)
+                    continue
+                new_name = storage.save(name, file)
+            recipe_ids = list(Recipe.objects.filter(
+                image=name).values_list('id', flat=True))
+            Recipe.objects.filter(image=name).update(image=new_name)
+            for recipe_id in recipe_ids:
+                schedule_recipe_image(recipe_id)
+            self.stdout.write(f'{name} -> {new_name}')
+        action = 'Найдено' if options['dry_run'] else 'Очищено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} картинок с метаданными: {stripped}.'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import update_trending_scores
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает оценку trending для сортировки рецептов.'
+
+    def handle(self, *args, **options):
+        updated = update_trending_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}.'
+        ))
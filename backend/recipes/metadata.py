@@ -0,0 +1,289 @@
+import os
+import struct
+import zlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+EXIF_HEADER = b'Exif\x00\x00'
+ORIENTATION = 0x0112
+METADATA_INFO = ('xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_APP0 = 0xE0
+JPEG_APP1 = 0xE1
+JPEG_APP2 = 0xE2
+JPEG_APP14 = 0xEE
+JPEG_SOS = 0xDA
+JPEG_EOI = 0xD9
+JPEG_COM = 0xFE
+JPEG_STANDALONE = {0x01, *range(0xD0, 0xD8)}
+ICC_PROFILE = b'ICC_PROFILE\x00'
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_METADATA = {b'tEXt', b'zTXt', b'iTXt', b'eXIf', b'tIME'}
+
+WEBP_METADATA = {b'EXIF', b'XMP '}
+WEBP_EXIF_FLAG = 0x08
+WEBP_XMP_FLAG = 0x04
+
+GIF_HEADERS = (b'GIF87a', b'GIF89a')
+GIF_IMAGE = 0x2C
+GIF_EXTENSION = 0x21
+GIF_TRAILER = 0x3B
+GIF_COMMENT = 0xFE
+GIF_APPLICATION = 0xFF
+GIF_ANIMATION_APPS = (b'NETSCAPE2.0', b'ANIMEXTS1.0')
+
+MALFORMED = (ValueError, IndexError, struct.error)
+
+
+def get_orientation(exif):
+    """Ориентация из EXIF или 1, если её нет или EXIF не читается."""
+    if not exif:
+        return 1
+    parsed = Image.Exif()
+    try:
+        parsed.load(exif)
+    except (SyntaxError, *MALFORMED):
+        return 1
+    return parsed.get(ORIENTATION, 1)
+
+
+def orientation_exif(exif):
+    """EXIF (без заголовка Exif) только с ориентацией из exif.
+
+    Пиксели при очистке не поворачиваются, поэтому ориентация
+    остаётся в файле, а всё остальное, в том числе GPS, удаляется.
+    Возвращает None, если поворачивать не нужно.
+    """
+    orientation = get_orientation(exif)
+    if orientation == 1:
+        return None
+    minimal = Image.Exif()
+    minimal[ORIENTATION] = orientation
+    return minimal.tobytes()[len(EXIF_HEADER):]
+
+
+def strip_jpeg(data):
+    """JPEG без сегментов APP1-APP15 (кроме ICC и Adobe) и комментариев.
+
+    Сжатые данные копируются как есть, всё после первого EOI (второй
+    кадр MPO, приклеенные файлы) отбрасывается.
+    """
+    if not data.startswith(JPEG_SOI):
+        raise ValueError('not a JPEG')
+    output = [JPEG_SOI]
+    exif_position = 1
+    exif = None
+    position = 2
+    while True:
+        if data[position] != 0xFF:
+            raise ValueError('JPEG marker expected')
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker == JPEG_EOI:
+            output.append(data[position:position + 2])
+            break
+        if marker in JPEG_STANDALONE:
+            output.append(data[position:position + 2])
+            position += 2
+            continue
+        length, = struct.unpack('>H', data[position + 2:position + 4])
+        end = position + 2 + length
+        if length < 2 or end > len(data):
+            raise ValueError('truncated JPEG segment')
+        payload = data[position + 4:end]
+        if marker == JPEG_APP1 and payload.startswith(EXIF_HEADER):
+            exif = exif or payload
+        if marker == JPEG_APP0 and exif_position == len(output):
+            output.append(data[position:end])
+            exif_position += 1
+        elif (marker < JPEG_APP0 or marker > 0xEF or marker == JPEG_APP14
+                or (marker == JPEG_APP2 and payload.startswith(ICC_PROFILE))):
+            if marker != JPEG_COM:
+                output.append(data[position:end])
+        position = end
+        if marker == JPEG_SOS:
+            position = skip_entropy_data(data, position)
+            output.append(data[end:position])
+    orientation = orientation_exif(exif)
+    if orientation is not None:
+        payload = EXIF_HEADER + orientation
+        output.insert(exif_position, struct.pack(
+            '>BBH', 0xFF, JPEG_APP1, len(payload) + 2) + payload)
+    return b''.join(output)
+
+
+def skip_entropy_data(data, position):
+    """Позиция первого маркера после сжатых данных скана."""
+    while True:
+        position = data.index(b'\xff', position)
+        following = data[position + 1]
+        if following == 0 or following == 0xFF or (
+                0xD0 <= following <= 0xD7):
+            position += 1 if following == 0xFF else 2
+            continue
+        return position
+
+
+def png_chunk(chunk_type, payload):
+    return (
+        struct.pack('>I', len(payload)) + chunk_type + payload
+        + struct.pack('>I', zlib.crc32(chunk_type + payload))
+    )
+
+
+def strip_png(data):
+    """PNG без текстовых чанков, eXIf и tIME; кадры APNG сохраняются."""
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError('not a PNG')
+    output = [PNG_SIGNATURE]
+    exif = None
+    position = len(PNG_SIGNATURE)
+    while True:
+        length, chunk_type = struct.unpack(
+            '>I4s', data[position:position + 8])
+        end = position + 12 + length
+        if end > len(data):
+            raise ValueError('truncated PNG chunk')
+        if chunk_type == b'eXIf':
+            exif = data[position + 8:end - 4]
+        if chunk_type not in PNG_METADATA:
+            output.append(data[position:end])
+        position = end
+        if chunk_type == b'IEND':
+            break
+    orientation = orientation_exif(exif)
+    if orientation is not None:
+        output.insert(2, png_chunk(b'eXIf', orientation))
+    return b''.join(output)
+
+
+def strip_webp(data):
+    """WebP без чанков EXIF и XMP; флаги VP8X исправляются."""
+    if data[:4] != b'RIFF' or data[8:12] != b'WEBP':
+        raise ValueError('not a WebP')
+    riff_end = 8 + struct.unpack('<I', data[4:8])[0]
+    if riff_end > len(data):
+        raise ValueError('truncated WebP')
+    chunks = []
+    exif = None
+    position = 12
+    while position < riff_end:
+        fourcc, size = struct.unpack('<4sI', data[position:position + 8])
+        end = position + 8 + size + (size & 1)
+        if end > riff_end:
+            raise ValueError('truncated WebP chunk')
+        if fourcc == b'EXIF':
+            exif = data[position + 8:position + 8 + size]
+        if fourcc not in WEBP_METADATA:
+            chunks.append(bytearray(data[position:end]))
+        position = end
+    orientation = orientation_exif(exif)
+    if chunks and chunks[0][:4] == b'VP8X':
+        chunks[0][8] &= ~(WEBP_EXIF_FLAG | WEBP_XMP_FLAG) & 0xFF
+        if orientation is not None:
+            chunks[0][8] |= WEBP_EXIF_FLAG
+            chunks.append(struct.pack('<4sI', b'EXIF', len(orientation))
+                          + orientation + b'\x00' * (len(orientation) & 1))
+    body = b'WEBP' + b''.join(chunks)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def skip_sub_blocks(data, position):
+    while True:
+        size = data[position]
+        position += 1 + size
+        if size == 0:
+            return position
+
+
+def strip_gif(data):
+    """GIF без комментариев и блоков приложений, кроме счётчика повторов.
+
+    Все кадры анимации и их задержки остаются.
+    """
+    if data[:6] not in GIF_HEADERS:
+        raise ValueError('not a GIF')
+    flags = data[10]
+    position = 13 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)
+    output = [data[:position]]
+    while True:
+        introducer = data[position]
+        start = position
+        if introducer == GIF_TRAILER:
+            output.append(data[position:position + 1])
+            break
+        if introducer == GIF_IMAGE:
+            flags = data[position + 9]
+            position += 10 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)
+            position = skip_sub_blocks(data, position + 1)
+            output.append(data[start:position])
+        elif introducer == GIF_EXTENSION:
+            label = data[position + 1]
+            position = skip_sub_blocks(data, position + 2)
+            application = data[start + 3:start + 14]
+            if label != GIF_COMMENT and (
+                    label != GIF_APPLICATION
+                    or application in GIF_ANIMATION_APPS):
+                output.append(data[start:position])
+        else:
+            raise ValueError('unknown GIF block')
+    return b''.join(output)
+
+
+STRIPPERS = (
+    (JPEG_SOI, strip_jpeg),
+    (PNG_SIGNATURE, strip_png),
+    (b'RIFF', strip_webp),
+    (b'GIF8', strip_gif),
+)
+
+
+def reencode(name, data):
+    """Однокадровая картинка другого формата, пересохранённая в PNG.
+
+    Многокадровые картинки редких форматов остаются как есть.
+    """
+    with Image.open(BytesIO(data)) as source:
+        if getattr(source, 'n_frames', 1) > 1:
+            return name, data
+        image = ImageOps.exif_transpose(source)
+    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, 'PNG', optimize=True)
+    return os.path.splitext(name)[0] + '.png', buffer.getvalue()
+
+
+def strip_metadata(name, content):
+    """Картинка без EXIF (в том числе GPS), XMP и текстовых полей.
+
+    JPEG, PNG, WebP и GIF очищаются без перекодирования: из файла
+    вырезаются блоки метаданных, сжатые данные и кадры анимации
+    не меняются. Из EXIF остаётся только ориентация. Возвращает новые
+    имя и содержимое.
+    """
+    content.seek(0)
+    data = content.read()
+    for signature, strip in STRIPPERS:
+        if data.startswith(signature):
+            try:
+                return name, ContentFile(strip(data))
+            except MALFORMED:
+                break
+    name, data = reencode(name, data)
+    return name, ContentFile(data)
+
+
+def has_metadata(image):
+    """Есть ли в открытой картинке EXIF кроме ориентации, XMP
+    или текстовые поля."""
+    return (
+        bool(set(image.getexif()) - {ORIENTATION})
+        or any(key in image.info for key in METADATA_INFO)
+        or bool(getattr(image, 'text', None))
+    )
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.1 on 2026-10-18 20:42
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_CONFIGS = ('russian', 'english')
+
+INGREDIENT_NAMES_SQL = (
+    "(SELECT string_agg(i.name, ' ') "
+    'FROM recipes_recipeingredients ri '
+    'JOIN ingredients_ingredient i ON i.id = ri.ingredient_id '
+    'WHERE ri.recipe_id = recipes_recipe.id)'
+)
+
+
+def vector_sql(config):
+    return ' || '.join(
+        f"setweight(to_tsvector('{config}', coalesce({column}, '')), "
+        f"'{weight}')"
+        for column, weight in (
+            ('name', 'A'), ('text', 'B'), (INGREDIENT_NAMES_SQL, 'C'),
+        )
+    )
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'UPDATE recipes_recipe SET search_vector = '
+        + ' || '.join(vector_sql(config) for config in SEARCH_CONFIGS)
+    )
+    schema_editor.execute(
+        'CREATE INDEX recipe_search_vector_gin '
+        'ON recipes_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-date',), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
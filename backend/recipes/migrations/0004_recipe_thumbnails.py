@@ -0,0 +1,18 @@
+# Generated by Django 3.2.1 on 2026-10-18 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnails',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Уменьшенные копии'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.1 on 2026-10-18 21:21
+
+from django.db import migrations, models
+
+COUNTERS = (
+    ('recipes_recipe', 'favorites_count', 'favorite_favorite', 'recipe_id'),
+    ('recipes_recipe', 'shopping_cart_count',
+     'shoppingcart_shoppingcart', 'recipe_id'),
+    ('users_customuser', 'followers_count', 'users_followuser', 'author_id'),
+    ('users_customuser', 'recipes_count', 'recipes_recipe', 'author_id'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for table, column, related_table, foreign_key in COUNTERS:
+        schema_editor.execute(
+            f'UPDATE {table} SET {column} = ('
+            f'SELECT count(*) FROM {related_table} '
+            f'WHERE {related_table}.{foreign_key} = {table}.id)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_content_addressed_image'),
+        ('users', '0003_counters'),
+        ('favorite', '0002_query_indexes'),
+        ('shoppingcart', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.1 on 2026-10-18 22:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_neighbours'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIndexChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField(null=True, verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Изменение индекса рецептов',
+                'verbose_name_plural': 'Изменения индекса рецептов',
+            },
+        ),
+    ]
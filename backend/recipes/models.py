@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.validators import MinValueValidator
 
@@ -5,6 +6,8 @@ from users.models import CustomUser
 from tag.models import Tag
 from ingredients.models import Ingredient
 
+from .storage import ContentAddressedStorage
+
 
 MAX_RECIPENAME_LENGHT = 200
 MIN_COOKING_AMOUNT = 1
@@ -20,7 +23,8 @@ class Recipe(models.Model):
         CustomUser,
         verbose_name='Автор',
         related_name='recipes',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     tags = models.ManyToManyField(
         Tag,
@@ -34,8 +38,14 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='recipes/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    thumbnails = models.JSONField(
+        verbose_name='Уменьшенные копии',
+        default=dict,
+        editable=False
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         verbose_name='Ингредиенты',
@@ -50,6 +60,26 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False
+    )
+    trending_score = models.FloatField(
+        verbose_name='Популярность за последнее время',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -60,6 +90,22 @@ class Recipe(models.Model):
                 fields=('name', 'author'), name='unique_recipe'
             ),
         )
+        indexes = (
+            models.Index(fields=('-date', '-id'), name='recipe_date_idx'),
+            models.Index(
+                fields=('author', '-date', '-id'),
+                name='recipe_author_date_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'), name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=('-trending_score', '-id'), name='recipe_trending_idx'
+            ),
+            models.Index(
+                fields=('cooking_time', 'id'), name='recipe_cooking_time_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -95,3 +141,58 @@ class RecipeIngredients(models.Model):
 
     def __str__(self):
         return f'{self.recipe.name} - {self.ingredient.name}'
+
+
+class RecipeNeighbour(models.Model):
+    """ Рецепт, который часто добавляют вместе с данным. """
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='neighbours',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    neighbour = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    score = models.FloatField(
+        verbose_name='Сходство'
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'neighbour'), name='unique_recipe_neighbour'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'), name='recipe_neighbour_score_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe.name} - {self.neighbour.name}'
+
+
+class RecipeIndexChange(models.Model):
+    """ Изменённый рецепт в журнале индекса рекомендаций.
+
+    Пустой recipe_id означает, что индекс нужно построить заново.
+    """
+    recipe_id = models.BigIntegerField(
+        verbose_name='Рецепт',
+        null=True
+    )
+
+    class Meta:
+        verbose_name = 'Изменение индекса рецептов'
+        verbose_name_plural = 'Изменения индекса рецептов'
+
+    def __str__(self):
+        return f'{self.pk}: {self.recipe_id}'
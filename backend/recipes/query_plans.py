@@ -0,0 +1,111 @@
+from django.db import connection
+
+from api.filters import RECIPE_ORDERINGS, filter_by_user
+from api.views import get_recipes_queryset
+from favorite.models import Favorite
+from shoppingcart.models import ShoppingCart
+from users.models import CustomUser, FollowUser
+
+from .models import Recipe, RecipeIngredients, RecipeNeighbour
+
+PAGE_SIZE = 10
+LARGE_TABLES = {
+    Recipe._meta.db_table,
+    Recipe.tags.through._meta.db_table,
+    RecipeIngredients._meta.db_table,
+    Favorite._meta.db_table,
+    ShoppingCart._meta.db_table,
+    FollowUser._meta.db_table,
+    CustomUser._meta.db_table,
+    RecipeNeighbour._meta.db_table,
+}
+EXPECTED_INDEXES = {
+    'recipe list': {'recipe_date_idx'},
+    'recipes by author': {'recipe_author_date_idx'},
+    'favorited recipes': {'unique_favorite'},
+    'recipes in shopping cart': {'unique_shopping_cart'},
+    'favorite lookup': {'unique_favorite', 'favorite_recipe_user_idx'},
+    'shopping cart lookup': {
+        'unique_shopping_cart', 'shopping_cart_recipe_user_idx'},
+    'shopping cart users of recipe': {'shopping_cart_recipe_user_idx'},
+    'recipe neighbours': {'recipe_neighbour_score_idx'},
+    'follow lookup': {'unique_follow', 'follow_author_user_idx'},
+    'subscriptions': {'unique_follow'},
+    'recipes ordered by newest': {'recipe_date_idx'},
+    'recipes ordered by popular': {'recipe_popular_idx'},
+    'recipes ordered by trending': {'recipe_trending_idx'},
+    'recipes ordered by cooking_time': {'recipe_cooking_time_idx'},
+}
+
+
+def find_seq_scans(plan):
+    """Возвращает таблицы из LARGE_TABLES, которые читаются Seq Scan."""
+    tables = []
+    if (plan.get('Node Type') == 'Seq Scan'
+            and plan.get('Relation Name') in LARGE_TABLES):
+        tables.append(plan['Relation Name'])
+    for subplan in plan.get('Plans', ()):
+        tables.extend(find_seq_scans(subplan))
+    return tables
+
+
+def find_indexes(plan):
+    """Имена всех индексов, которые читает план."""
+    indexes = {plan['Index Name']} if 'Index Name' in plan else set()
+    for subplan in plan.get('Plans', ()):
+        indexes |= find_indexes(subplan)
+    return indexes
+
+
+def find_plan_problems(name, plan):
+    """Seq Scan по большим таблицам и пропавшие из плана индексы.
+
+    Запрос, который перестал использовать свой индекс и читает таблицу
+    по другому, тоже считается регрессией плана.
+    """
+    problems = [f'Seq Scan по {table}' for table in find_seq_scans(plan)]
+    expected = EXPECTED_INDEXES.get(name)
+    if expected and not expected & find_indexes(plan):
+        problems.append(f'нет индекса {" или ".join(sorted(expected))}')
+    return problems
+
+
+def get_hot_queries(user, author, tag, recipe):
+    """Горячие запросы API, которым нужны индексы."""
+    recipes = get_recipes_queryset()
+    return {
+        'recipe list': recipes[:PAGE_SIZE],
+        'recipes by author': recipes.filter(author=author)[:PAGE_SIZE],
+        'recipes by tag': recipes.filter(
+            tags__slug=tag.slug)[:PAGE_SIZE],
+        'favorited recipes': filter_by_user(
+            recipes, Favorite, user)[:PAGE_SIZE],
+        'recipes in shopping cart': filter_by_user(
+            recipes, ShoppingCart, user)[:PAGE_SIZE],
+        'recipe detail': recipes.filter(pk=recipe.pk),
+        'favorite lookup': Favorite.objects.filter(
+            user=user, recipe=recipe),
+        'shopping cart lookup': ShoppingCart.objects.filter(
+            user=user, recipe=recipe),
+        'shopping cart users of recipe': ShoppingCart.objects.filter(
+            recipe=recipe).values('user_id'),
+        'recipe neighbours': RecipeNeighbour.objects.filter(
+            recipe=recipe).order_by('-score')[:PAGE_SIZE],
+        'follow lookup': FollowUser.objects.filter(
+            user=user, author=author),
+        'subscriptions': CustomUser.objects.filter(
+            following__user=user
+        ).order_by('id')[:PAGE_SIZE],
+        **{
+            f'recipes ordered by {name}': recipes.order_by(
+                *ordering)[:PAGE_SIZE]
+            for name, ordering in RECIPE_ORDERINGS.items()
+        },
+    }
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        return cursor.fetchone()[0][0]['Plan']
@@ -0,0 +1,374 @@
+"""Подбор рецептов по ингредиентам и поиск похожих рецептов.
+
+Связи рецептов с ингредиентами хранятся в памяти процесса разреженной
+матрицей инцидентности: по строкам (CSR, ингредиенты рецепта) и по
+столбцам (CSC, рецепты с ингредиентом) в массивах array. Матрица
+сохраняется в двоичный файл RECIPE_INDEX_PATH, поэтому процесс
+поднимает её без запросов к базе.
+
+Изменённые рецепты записываются в таблицу RecipeIndexChange, версия
+индекса - последний id журнала. Процесс, отставший от журнала,
+перечитывает из базы только эти рецепты и держит их поверх матрицы,
+пока их не станет больше OVERLAY_LIMIT. Журнал в базе одинаков для
+всех процессов, в отличие от кеша в памяти процесса.
+
+Версия журнала проверяется не чаще RECIPE_INDEX_CHECK_INTERVAL секунд.
+Если журнала не хватает, матрица перестраивается в фоновом потоке,
+а запросы до конца перестроения получают прежний индекс.
+"""
+import heapq
+import logging
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .models import RecipeIndexChange, RecipeIngredients
+
+MAX_REPLAY = 1000
+OVERLAY_LIMIT = 5000
+JOURNAL_LOCK = 0x46475249
+MAGIC = b'FGR2'
+HEADER = struct.Struct('<4sBqqqq')
+
+logger = logging.getLogger(__name__)
+
+
+class IncidenceMatrix:
+    """Неизменяемая матрица рецепт × ингредиент в формате CSR и CSC."""
+
+    def __init__(self, recipe_ids, indptr, indices,
+                 ingredient_ids, column_ptr, column_rows, version):
+        self.recipe_ids = recipe_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.ingredient_ids = ingredient_ids
+        self.column_ptr = column_ptr
+        self.column_rows = column_rows
+        self.version = version
+
+    @classmethod
+    def from_rows(cls, rows, version):
+        """Строит матрицу из пар (рецепт, ингредиент), сортированных
+        по рецепту."""
+        recipe_ids, indptr, indices = array('q'), array('q', [0]), array('q')
+        columns = defaultdict(list)
+        for recipe_id, ingredient_id in rows:
+            if not recipe_ids or recipe_ids[-1] != recipe_id:
+                if recipe_ids:
+                    indptr.append(len(indices))
+                recipe_ids.append(recipe_id)
+            columns[ingredient_id].append(len(recipe_ids) - 1)
+            indices.append(ingredient_id)
+        if recipe_ids:
+            indptr.append(len(indices))
+        ingredient_ids = array('q', sorted(columns))
+        column_ptr, column_rows = array('q', [0]), array('i')
+        for ingredient_id in ingredient_ids:
+            column_rows.extend(columns.pop(ingredient_id))
+            column_ptr.append(len(column_rows))
+        return cls(recipe_ids, indptr, indices,
+                   ingredient_ids, column_ptr, column_rows, version)
+
+    def save(self, path):
+        """Записывает матрицу во временный файл и подменяет им path."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(HEADER.pack(
+                MAGIC, self.column_rows.itemsize, self.version,
+                len(self.recipe_ids), len(self.indices),
+                len(self.ingredient_ids),
+            ))
+            for values in self.arrays():
+                values.tofile(file)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            (magic, row_size, version, rows, nonzero,
+             columns) = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or row_size != array('i').itemsize:
+                raise ValueError(f'Неверный формат файла {path}')
+            arrays = []
+            for typecode, length in (
+                    ('q', rows), ('q', rows + 1), ('q', nonzero),
+                    ('q', columns), ('q', columns + 1), ('i', nonzero)):
+                values = array(typecode)
+                values.fromfile(file, length)
+                arrays.append(values)
+        return cls(*arrays, version)
+
+    def arrays(self):
+        return (self.recipe_ids, self.indptr, self.indices,
+                self.ingredient_ids, self.column_ptr, self.column_rows)
+
+    def row(self, recipe_id):
+        position = bisect_left(self.recipe_ids, recipe_id)
+        if (position == len(self.recipe_ids)
+                or self.recipe_ids[position] != recipe_id):
+            return ()
+        return self.indices[self.indptr[position]:self.indptr[position + 1]]
+
+    def column(self, ingredient_id):
+        position = bisect_left(self.ingredient_ids, ingredient_id)
+        if (position == len(self.ingredient_ids)
+                or self.ingredient_ids[position] != ingredient_id):
+            return ()
+        recipe_ids = self.recipe_ids
+        return (recipe_ids[row] for row in self.column_rows[
+            self.column_ptr[position]:self.column_ptr[position + 1]])
+
+    def rows(self):
+        for position, recipe_id in enumerate(self.recipe_ids):
+            for ingredient_id in self.indices[
+                    self.indptr[position]:self.indptr[position + 1]]:
+                yield recipe_id, ingredient_id
+
+
+class RecipeIndex:
+    """Матрица из файла и журнала плюс рецепты, изменённые после неё."""
+
+    def __init__(self, matrix, overlay=None):
+        self.matrix = matrix
+        self.overlay = overlay or {}
+        self.overlay_columns = defaultdict(set)
+        for recipe_id, ingredient_ids in self.overlay.items():
+            for ingredient_id in ingredient_ids:
+                self.overlay_columns[ingredient_id].add(recipe_id)
+
+    @property
+    def version(self):
+        return self.matrix.version
+
+    def row(self, recipe_id):
+        if recipe_id in self.overlay:
+            return self.overlay[recipe_id]
+        return self.matrix.row(recipe_id)
+
+    def column(self, ingredient_id):
+        overlay = self.overlay
+        for recipe_id in self.matrix.column(ingredient_id):
+            if recipe_id not in overlay:
+                yield recipe_id
+        yield from self.overlay_columns.get(ingredient_id, ())
+
+    def count_matches(self, ingredient_ids):
+        matches = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matches.update(self.column(ingredient_id))
+        return matches
+
+    def rank_by_ingredients(self, ingredient_ids, limit):
+        """Рецепты по доле ингредиентов, которые уже есть у пользователя.
+
+        Возвращает (id рецепта, доля, число недостающих) по убыванию
+        доли, при равной доле сначала рецепты с меньшим числом
+        недостающих ингредиентов.
+        """
+        ranked = []
+        for recipe_id, matched in self.count_matches(ingredient_ids).items():
+            size = len(self.row(recipe_id))
+            ranked.append((matched / size, matched - size, recipe_id))
+        return [
+            (recipe_id, coverage, -missing)
+            for coverage, missing, recipe_id in heapq.nlargest(limit, ranked)
+        ]
+
+    def similar(self, recipe_id, limit):
+        """Рецепты с наибольшим коэффициентом Жаккара по ингредиентам."""
+        ingredient_ids = self.row(recipe_id)
+        size = len(ingredient_ids)
+        ranked = []
+        for other_id, shared in self.count_matches(ingredient_ids).items():
+            if other_id != recipe_id:
+                union = size + len(self.row(other_id)) - shared
+                ranked.append((shared / union, other_id))
+        return [
+            (other_id, score)
+            for score, other_id in heapq.nlargest(limit, ranked)
+        ]
+
+    def apply_changes(self, recipe_ids, version):
+        """Новый индекс с перечитанными из базы рецептами recipe_ids."""
+        rows = dict.fromkeys(recipe_ids, ())
+        for recipe_id, ingredient_id in get_rows(recipe_ids):
+            rows[recipe_id] += (ingredient_id,)
+        overlay = {**self.overlay, **rows}
+        matrix = self.matrix
+        if len(overlay) <= OVERLAY_LIMIT:
+            return RecipeIndex(IncidenceMatrix(
+                *matrix.arrays(), version), overlay)
+        merged = sorted(
+            (recipe_id, ingredient_id)
+            for recipe_id, ingredient_id in matrix.rows()
+            if recipe_id not in overlay
+        )
+        merged.extend(
+            (recipe_id, ingredient_id)
+            for recipe_id, ingredient_ids in overlay.items()
+            for ingredient_id in ingredient_ids
+        )
+        merged.sort()
+        return RecipeIndex(IncidenceMatrix.from_rows(merged, version))
+
+
+def get_rows(recipe_ids=None):
+    queryset = RecipeIngredients.objects.order_by('recipe_id', 'ingredient_id')
+    if recipe_ids is not None:
+        queryset = queryset.filter(recipe_id__in=recipe_ids)
+    return queryset.values_list('recipe_id', 'ingredient_id').iterator()
+
+
+def get_version():
+    return RecipeIndexChange.objects.aggregate(
+        version=Max('id'))['version'] or 0
+
+
+def record_change(recipe_id):
+    """Добавляет запись в журнал.
+
+    Записи добавляются под блокировкой, поэтому id видны в порядке
+    фиксации: читатель, увидевший запись N, видит и все до неё.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s)', (JOURNAL_LOCK,))
+        RecipeIndexChange.objects.create(recipe_id=recipe_id)
+
+
+def trim_changes(version):
+    """Удаляет записи, которые уже никому не нужны для повтора."""
+    RecipeIndexChange.objects.filter(id__lte=version - MAX_REPLAY).delete()
+
+
+class RecipeIndexLoader:
+    """Держит актуальный RecipeIndex процесса, как ingredient_index."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._checked_at = None
+        self._rebuilding = False
+
+    def get_version(self):
+        """Версия журнала, которая перечитывается из базы не чаще
+        RECIPE_INDEX_CHECK_INTERVAL секунд."""
+        now = time.monotonic()
+        if (self._checked_at is None or now - self._checked_at
+                >= settings.RECIPE_INDEX_CHECK_INTERVAL):
+            self._version = get_version()
+            self._checked_at = now
+        return self._version
+
+    def get(self):
+        version = self.get_version()
+        index = self._index
+        if index is not None and index.version >= version:
+            return index
+        if not self._lock.acquire(blocking=index is None):
+            return index
+        try:
+            index = self._index
+            if index is None:
+                index = self._load_file(version)
+            if index is not None and index.version < version:
+                replayed = self._replay(index, version)
+                if replayed is not None:
+                    index = replayed
+                elif not self._start_rebuild(version):
+                    index = None
+            if index is None:
+                index = self._build(version)
+            self._index = index
+        finally:
+            self._lock.release()
+        return index
+
+    def _start_rebuild(self, version):
+        """Запускает перестроение в фоне; False, если оно выключено
+        настройкой RECIPE_INDEX_BACKGROUND_REBUILD."""
+        if not settings.RECIPE_INDEX_BACKGROUND_REBUILD:
+            return False
+        if not self._rebuilding:
+            self._rebuilding = True
+            threading.Thread(
+                target=self._rebuild_in_background, args=(version,),
+                name='recipe-index', daemon=True,
+            ).start()
+        return True
+
+    def _rebuild_in_background(self, version):
+        try:
+            index = self._build(version)
+            with self._lock:
+                if self._index is None or self._index.version < version:
+                    self._index = index
+        except Exception:
+            logger.exception('Не удалось перестроить индекс рецептов')
+        finally:
+            self._rebuilding = False
+            connection.close()
+
+    def _load_file(self, version):
+        try:
+            matrix = IncidenceMatrix.load(settings.RECIPE_INDEX_PATH)
+        except (OSError, ValueError, EOFError):
+            return None
+        return RecipeIndex(matrix)
+
+    def _replay(self, index, version):
+        """Применяет журнал изменений или возвращает None, если его
+        не хватает."""
+        if version - index.version > MAX_REPLAY:
+            return None
+        recipe_ids = set(RecipeIndexChange.objects.filter(
+            id__gt=index.version, id__lte=version,
+        ).values_list('recipe_id', flat=True))
+        if None in recipe_ids:
+            return None
+        replayed = index.apply_changes(recipe_ids, version)
+        if not replayed.overlay:
+            self._save(replayed.matrix)
+        return replayed
+
+    def _build(self, version):
+        matrix = IncidenceMatrix.from_rows(get_rows(), version)
+        self._save(matrix)
+        trim_changes(version)
+        return RecipeIndex(matrix)
+
+    def _save(self, matrix):
+        try:
+            matrix.save(settings.RECIPE_INDEX_PATH)
+        except OSError:
+            logger.exception('Не удалось сохранить индекс рецептов')
+
+    def mark_changed(self, recipe_id):
+        transaction.on_commit(lambda: record_change(recipe_id))
+
+    def invalidate(self):
+        """Заставляет все процессы перестроить индекс из базы.
+
+        Нужен после массовых изменений в обход сигналов.
+        """
+        transaction.on_commit(lambda: record_change(None))
+
+    def rebuild(self):
+        with self._lock:
+            self._index = self._build(get_version())
+        return self._index
+
+
+recipe_index = RecipeIndexLoader()
@@ -0,0 +1,76 @@
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector,
+)
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q, Subquery, TextField
+
+from .models import Recipe, RecipeIngredients
+
+SEARCH_CONFIGS = ('russian', 'english')
+
+
+def is_full_text_search_supported():
+    return connection.vendor == 'postgresql'
+
+
+def build_search_vector():
+    """Вектор из названия, описания и ингредиентов рецепта.
+
+    Вектор строится для русского и английского словарей, чтобы запрос
+    на любом из языков находил рецепт с учётом словоформ.
+    """
+    ingredient_names = Subquery(
+        RecipeIngredients.objects.filter(recipe=OuterRef('pk'))
+        .values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names'),
+        output_field=TextField(),
+    )
+    vector = None
+    for config in SEARCH_CONFIGS:
+        config_vector = (
+            SearchVector('name', weight='A', config=config)
+            + SearchVector('text', weight='B', config=config)
+            + SearchVector(ingredient_names, weight='C', config=config)
+        )
+        vector = config_vector if vector is None else vector + config_vector
+    return vector
+
+
+def update_search_vector(recipe_ids):
+    if not is_full_text_search_supported():
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        search_vector=build_search_vector()
+    )
+
+
+def search_recipes(queryset, value):
+    """Фильтрует рецепты по запросу и сортирует по релевантности.
+
+    Без PostgreSQL используется поиск по подстроке, чтобы фильтр
+    работал на SQLite при локальной разработке. LIKE в SQLite не
+    различает регистр только у латиницы, поэтому подстрока ищется
+    через iregex: на SQLite его выполняет re из Python, и «суп»
+    находит «Суп».
+    """
+    if not is_full_text_search_supported():
+        pattern = re.escape(value)
+        return queryset.annotate(has_ingredient=Exists(
+            RecipeIngredients.objects.filter(
+                recipe=OuterRef('pk'), ingredient__name__iregex=pattern)
+        )).filter(
+            Q(name__iregex=pattern)
+            | Q(text__iregex=pattern)
+            | Q(has_ingredient=True)
+        )
+    query = None
+    for config in SEARCH_CONFIGS:
+        config_query = SearchQuery(value, config=config)
+        query = config_query if query is None else query | config_query
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-date')
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .images import schedule_recipe_image
+from .models import Recipe, RecipeIngredients
+from .recommendations import recipe_index
+from .search import update_search_vector
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    update_search_vector((instance.pk,))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_thumbnails(sender, instance, **kwargs):
+    if (instance.image.name or None) != instance.thumbnails.get('source'):
+        schedule_recipe_image(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def update_ingredients_search_vector(sender, instance, **kwargs):
+    update_search_vector((instance.recipe_id,))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def update_recipe_index(sender, instance, **kwargs):
+    recipe_index.mark_changed(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def update_ingredients_recipe_index(sender, instance, **kwargs):
+    recipe_index.mark_changed(instance.recipe_id)
@@ -0,0 +1,68 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count
+
+from .metadata import strip_metadata
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище картинок, в котором имя файла - хеш его содержимого.
+
+    Картинка перед сохранением очищается от метаданных без
+    перекодирования, поэтому в оригинале не остаются координаты
+    съёмки. Одинаковые картинки хранятся одним файлом: повторная
+    загрузка возвращает имя уже сохранённого файла без записи на диск.
+    """
+
+    def get_content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name, content = strip_metadata(name, content)
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def is_blob(self, name):
+        directory, filename = os.path.split(name)
+        return len(os.path.basename(directory)) == 2 and filename.startswith(
+            os.path.basename(directory))
+
+    def list_blobs(self, directory):
+        """Имена всех файлов-хешей внутри directory."""
+        if not self.exists(directory):
+            return
+        prefixes, _ = self.listdir(directory)
+        for prefix in prefixes:
+            if len(prefix) != 2:
+                continue
+            for filename in self.listdir(os.path.join(directory, prefix))[1]:
+                name = os.path.join(directory, prefix, filename)
+                if self.is_blob(name):
+                    yield name
+
+
+def get_refcounts(field):
+    """Число ссылок на каждый файл поля field из строк модели."""
+    model = field.model
+    return dict(
+        model.objects.exclude(**{field.name: ''})
+        .values_list(field.name)
+        .annotate(refcount=Count('pk'))
+        .order_by()
+    )
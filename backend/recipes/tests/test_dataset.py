@@ -0,0 +1,22 @@
+from django.test import TestCase
+
+from recipes.dataset import DatasetGenerator
+from tag.models import Tag
+
+
+class DatasetGeneratorTest(TestCase):
+    """Генератор не конфликтует с данными, которые уже есть в базе."""
+
+    def test_same_seed_with_another_prefix(self):
+        first = DatasetGenerator(0, prefix='first').create_tags(5)
+        second = DatasetGenerator(0, prefix='second').create_tags(5)
+        self.assertEqual(Tag.objects.count(), 10)
+        self.assertFalse(
+            {tag.color for tag in first} & {tag.color for tag in second})
+
+    def test_prefix_taken(self):
+        generator = DatasetGenerator(0, prefix='taken')
+        self.assertFalse(generator.prefix_taken())
+        generator.create_users(1)
+        self.assertTrue(generator.prefix_taken())
+        self.assertFalse(DatasetGenerator(0, prefix='free').prefix_taken())
@@ -0,0 +1,132 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+from PIL import Image, PngImagePlugin
+
+from recipes.metadata import ORIENTATION, has_metadata, strip_metadata
+
+GPS_IFD = 0x8825
+XMP = b'<x:xmpmeta xmlns:x="adobe:ns:meta/">secret</x:xmpmeta>'
+
+
+def make_exif(orientation=6, gps=True):
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    exif[0x010F] = 'Camera'
+    if gps:
+        exif[GPS_IFD] = {1: 'N', 2: (55.0, 45.0, 0.0)}
+    return exif
+
+
+def make_image(mode='RGB', size=(64, 48)):
+    image = Image.new(mode, size)
+    for x in range(size[0]):
+        for y in range(size[1]):
+            value = (x * 7 + y * 13) % 256
+            image.putpixel((x, y), value if mode in ('L', 'P') else (
+                (value, 255 - value, x * 3 % 256, 200)[:len(mode)]))
+    return image
+
+
+def save(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+class StripMetadataTest(SimpleTestCase):
+    """Метаданные удаляются без перекодирования пикселей."""
+
+    def strip(self, data, name='image.jpg'):
+        new_name, content = strip_metadata(name, ContentFile(data))
+        return new_name, content.read()
+
+    def assertSamePixels(self, original, stripped):
+        with Image.open(BytesIO(original)) as before, \
+                Image.open(BytesIO(stripped)) as after:
+            self.assertEqual(before.format, after.format)
+            self.assertEqual(getattr(before, 'n_frames', 1),
+                             getattr(after, 'n_frames', 1))
+            for frame in range(getattr(before, 'n_frames', 1)):
+                before.seek(frame)
+                after.seek(frame)
+                self.assertEqual(before.tobytes(), after.tobytes())
+                self.assertEqual(before.info.get('duration'),
+                                 after.info.get('duration'))
+
+    def assertStripped(self, data, orientation=6):
+        with Image.open(BytesIO(data)) as image:
+            exif = image.getexif()
+            self.assertEqual(dict(exif), {ORIENTATION: orientation}
+                             if orientation != 1 else {})
+            self.assertFalse(has_metadata(image))
+        self.assertNotIn(b'secret', data)
+        self.assertNotIn(b'Camera', data)
+
+    def test_jpeg(self):
+        for progressive in (False, True):
+            with self.subTest(progressive=progressive):
+                original = save(
+                    make_image(), 'JPEG', quality=90, exif=make_exif(),
+                    progressive=progressive, comment=b'secret',
+                    icc_profile=b'profile',
+                )
+                name, stripped = self.strip(original + b'trailing secret')
+                self.assertEqual(name, 'image.jpg')
+                self.assertStripped(stripped)
+                self.assertSamePixels(original, stripped)
+                with Image.open(BytesIO(stripped)) as image:
+                    self.assertEqual(image.info['icc_profile'], b'profile')
+                scan = original.index(b'\xff\xda')
+                self.assertTrue(stripped.endswith(original[scan:]))
+
+    def test_jpeg_without_rotation(self):
+        original = save(make_image(), 'JPEG', exif=make_exif(1))
+        _, stripped = self.strip(original)
+        self.assertStripped(stripped, orientation=1)
+        self.assertSamePixels(original, stripped)
+
+    def test_png(self):
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Comment', 'secret')
+        info.add_itxt('XML:com.adobe.xmp', XMP.decode())
+        original = save(make_image('RGBA'), 'PNG', pnginfo=info,
+                        exif=make_exif())
+        _, stripped = self.strip(original, 'image.png')
+        self.assertStripped(stripped)
+        self.assertSamePixels(original, stripped)
+
+    def test_webp(self):
+        original = save(make_image(), 'WEBP', lossless=True,
+                        exif=make_exif(), xmp=XMP)
+        _, stripped = self.strip(original, 'image.webp')
+        self.assertStripped(stripped)
+        self.assertSamePixels(original, stripped)
+
+    def test_animated_gif(self):
+        frames = [make_image('P'), make_image('P').rotate(90)]
+        original = save(frames[0], 'GIF', save_all=True,
+                        append_images=frames[1:], duration=(100, 250),
+                        loop=0, comment=b'secret')
+        _, stripped = self.strip(original, 'image.gif')
+        self.assertNotIn(b'secret', stripped)
+        self.assertSamePixels(original, stripped)
+        with Image.open(BytesIO(stripped)) as image:
+            self.assertEqual(image.info.get('loop'), 0)
+
+    def test_other_format_becomes_png(self):
+        original = save(make_image(), 'TIFF', exif=make_exif(gps=False))
+        name, stripped = self.strip(original, 'image.tiff')
+        self.assertEqual(name, 'image.png')
+        with Image.open(BytesIO(stripped)) as image:
+            self.assertEqual(image.format, 'PNG')
+            self.assertFalse(image.getexif())
+
+    def test_malformed_jpeg_is_reencoded(self):
+        original = save(make_image(), 'JPEG', exif=make_exif())
+        scan = original.index(b'\xff\xda')
+        broken = original[:scan] + b'\x00' + original[scan:]
+        name, stripped = self.strip(broken)
+        self.assertEqual(name, 'image.png')
+        self.assertNotIn(b'Camera', stripped)
@@ -0,0 +1,100 @@
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredients
+from recipes.recommendations import RecipeIndexLoader, record_change
+from users.models import CustomUser
+
+
+class RecipeIndexLoaderTest(TestCase):
+    """Индекс догоняет журнал изменений, не задерживая запросы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(4)
+        ]
+        cls.recipes = []
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Текст',
+                cooking_time=10)
+            for ingredient in cls.ingredients[i:i + 2]:
+                RecipeIngredients.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1)
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            RECIPE_INDEX_PATH=f'{directory.name}/index.bin',
+            RECIPE_INDEX_CHECK_INTERVAL=0,
+            RECIPE_INDEX_BACKGROUND_REBUILD=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.loader = RecipeIndexLoader()
+        self.index = self.loader.get()
+
+    def add_ingredient(self, recipe, ingredient):
+        RecipeIngredients.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1)
+        record_change(recipe.pk)
+
+    def test_replay(self):
+        recipe, ingredient = self.recipes[0], self.ingredients[3]
+        self.add_ingredient(recipe, ingredient)
+        index = self.loader.get()
+        self.assertGreater(index.version, self.index.version)
+        self.assertIn(ingredient.pk, index.row(recipe.pk))
+        self.assertIn(recipe.pk, index.column(ingredient.pk))
+        self.assertNotIn(ingredient.pk, self.index.row(recipe.pk))
+
+    def test_file_is_loaded_by_another_process(self):
+        self.add_ingredient(self.recipes[0], self.ingredients[3])
+        with self.assertNumQueries(3):
+            index = RecipeIndexLoader().get()
+        self.assertIn(self.ingredients[3].pk, index.row(self.recipes[0].pk))
+
+    @override_settings(RECIPE_INDEX_CHECK_INTERVAL=60)
+    def test_version_is_checked_once_per_interval(self):
+        with self.assertNumQueries(1):
+            self.loader._checked_at = None
+            self.loader.get()
+        self.add_ingredient(self.recipes[0], self.ingredients[3])
+        with self.assertNumQueries(0):
+            self.assertIs(self.loader.get(), self.index)
+        self.loader._checked_at -= 60
+        self.assertIn(self.ingredients[3].pk,
+                      self.loader.get().row(self.recipes[0].pk))
+
+    @override_settings(RECIPE_INDEX_BACKGROUND_REBUILD=True)
+    def test_rebuild_in_background(self):
+        started, release = threading.Event(), threading.Event()
+        build = self.loader._build
+
+        def slow_build(version):
+            started.set()
+            release.wait(5)
+            return build(version)
+
+        record_change(None)
+        with mock.patch.object(self.loader, '_build', slow_build):
+            self.assertIs(self.loader.get(), self.index)
+            self.assertTrue(started.wait(5))
+            self.assertIs(self.loader.get(), self.index)
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name == 'recipe-index':
+                    thread.join(5)
+        self.assertGreater(self.loader.get().version, self.index.version)
+        self.assertFalse(self.loader.get().overlay)
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.dispatch import Signal
+from django.utils import timezone
+
+from favorite.models import Favorite
+from shoppingcart.models import ShoppingCart
+
+from .models import Recipe
+
+ACTIVITY_WEIGHTS = ((Favorite, 1), (ShoppingCart, 2))
+WINDOW_HALF_LIVES = 5
+
+trending_updated = Signal()
+
+
+def update_trending_scores(now=None):
+    """Пересчитывает trending_score всех рецептов одним запросом.
+
+    Каждое добавление в избранное или список покупок даёт вклад
+    с весом из ACTIVITY_WEIGHTS, который вдвое убывает за
+    TRENDING_HALF_LIFE часов. События старше WINDOW_HALF_LIVES
+    периодов полураспада не учитываются. Обновляются только строки,
+    у которых есть свежие события или ненулевая старая оценка.
+    Возвращает число обновлённых рецептов.
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    now = now or timezone.now()
+    half_life = timedelta(hours=settings.TRENDING_HALF_LIFE)
+    since = now - half_life * WINDOW_HALF_LIVES
+    events, params = [], []
+    for model, weight in ACTIVITY_WEIGHTS:
+        events.append(
+            'SELECT recipe_id, %s * power(0.5, '
+            'extract(epoch FROM %s - created) / %s) AS score '
+            f'FROM {model._meta.db_table} WHERE created >= %s'
+        )
+        params.extend((weight, now, half_life.total_seconds(), since))
+    table = Recipe._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'WITH scores AS (SELECT recipe_id, sum(score) AS score '
+            f'FROM ({" UNION ALL ".join(events)}) events '
+            'GROUP BY recipe_id) '
+            f'UPDATE {table} SET trending_score = coalesce('
+            f'(SELECT score FROM scores WHERE recipe_id = {table}.id), 0) '
+            'WHERE trending_score <> 0 '
+            'OR id IN (SELECT recipe_id FROM scores)',
+            params,
+        )
+        updated = cursor.rowcount
+    trending_updated.send(sender=Recipe)
+    return updated
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shoppingcart.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает суммы ингредиентов в списках покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='only compare stored totals with recalculated ones',
+        )
+
+    def find_drift(self):
+        expected = {
+            (row['user'], row['ingredient']): row['total']
+            for row in ShoppingCartIngredient.objects.calculate().iterator()
+        }
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in
+            ShoppingCartIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount').iterator()
+        }
+        return sorted(
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            with transaction.atomic():
+                ShoppingCartIngredient.objects.rebuild()
+            self.stdout.write('Суммы ингредиентов пересчитаны.')
+        drift = self.find_drift()
+        if drift:
+            raise CommandError(
+                f'Расхождений с рецептами в списках покупок: {len(drift)}'
+            )
+        self.stdout.write(self.style.SUCCESS('Расхождений не найдено.'))
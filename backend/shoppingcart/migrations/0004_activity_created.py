@@ -0,0 +1,25 @@
+# Generated by Django 3.2.1 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import datetime
+from django.utils.timezone import utc
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=datetime.datetime(1970, 1, 1, 0, 0, tzinfo=utc), verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['created', 'recipe'], name='shopping_cart_created_idx'),
+        ),
+    ]
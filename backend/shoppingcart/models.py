@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import connections, models
 from users.models import CustomUser
-from recipes.models import Recipe
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredients
 
 
 class ShoppingCart(models.Model):
@@ -8,13 +9,19 @@ class ShoppingCart(models.Model):
         CustomUser,
         verbose_name='Пользователь',
         related_name='shoppingcart',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
         verbose_name='Рецепт',
         related_name='shoppingcart',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    created = models.DateTimeField(
+        verbose_name='Добавлен',
+        auto_now_add=True
     )
 
     class Meta:
@@ -25,6 +32,135 @@ class ShoppingCart(models.Model):
                 fields=('user', 'recipe'), name='unique_shopping_cart'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'),
+                name='shopping_cart_recipe_user_idx'
+            ),
+            models.Index(
+                fields=('created', 'recipe'),
+                name='shopping_cart_created_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.user} - {self.recipe}'
+
+
+class ShoppingCartIngredientManager(models.Manager):
+
+    def apply_delta(self, user_ids, deltas):
+        """Изменяет суммы ингредиентов пользователей на величины deltas.
+
+        deltas - словарь {id ингредиента: изменение количества}.
+        Строки с неположительной суммой удаляются.
+        """
+        deltas = {pk: amount for pk, amount in deltas.items() if amount}
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        rows = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        rows.update(amount=models.F('amount') + models.Case(
+            *(models.When(ingredient_id=pk, then=models.Value(amount))
+              for pk, amount in deltas.items()),
+            default=models.Value(0),
+            output_field=models.IntegerField(),
+        ))
+        existing = set(rows.values_list('user_id', 'ingredient_id'))
+        self.add_missing([
+            (user_id, pk, amount)
+            for user_id in user_ids
+            for pk, amount in deltas.items()
+            if amount > 0 and (user_id, pk) not in existing
+        ])
+        rows.filter(amount__lte=0).delete()
+
+    def add_missing(self, rows):
+        """Вставляет строки (пользователь, ингредиент, количество).
+
+        Строку, которую между проверкой и вставкой добавила параллельная
+        транзакция, например второе добавление рецепта тем же
+        пользователем, в PostgreSQL INSERT ... ON CONFLICT увеличивает
+        на количество, а не падает на уникальности.
+        """
+        if not rows:
+            return
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            self.bulk_create(
+                self.model(user_id=user_id, ingredient_id=pk, amount=amount)
+                for user_id, pk, amount in rows
+            )
+            return
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+                'SELECT * FROM unnest('
+                '%s::bigint[], %s::bigint[], %s::integer[]) '
+                'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {table}.amount + EXCLUDED.amount',
+                [list(column) for column in zip(*rows)],
+            )
+
+    def apply_recipe(self, user_ids, recipe, sign=1):
+        """Добавляет (sign=1) или вычитает (sign=-1) ингредиенты рецепта."""
+        self.apply_delta(user_ids, {
+            pk: sign * amount for pk, amount in
+            recipe.recipeingredients.values_list('ingredient_id', 'amount')
+        })
+
+    def calculate(self):
+        """Считает суммы заново по рецептам в списках покупок."""
+        return (
+            RecipeIngredients.objects
+            .filter(recipe__shoppingcart__isnull=False)
+            .values('ingredient', user=models.F('recipe__shoppingcart__user'))
+            .annotate(total=models.Sum('amount'))
+            .order_by('user', 'ingredient')
+        )
+
+    def rebuild(self):
+        self.all().delete()
+        self.bulk_create(
+            (self.model(user_id=row['user'],
+                        ingredient_id=row['ingredient'],
+                        amount=row['total'])
+             for row in self.calculate().iterator()),
+            batch_size=1000,
+        )
+
+
+class ShoppingCartIngredient(models.Model):
+    """ Сумма ингредиента по всем рецептам списка покупок пользователя. """
+    user = models.ForeignKey(
+        CustomUser,
+        verbose_name='Пользователь',
+        related_name='shoppingcart_ingredients',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        related_name='shoppingcart_ingredients',
+        on_delete=models.CASCADE
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество'
+    )
+
+    objects = ShoppingCartIngredientManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_cart_ingredient'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient}: {self.amount}'
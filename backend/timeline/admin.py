@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import TimelineEntry
+
+
+class TimelineEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'recipe', 'date')
+    search_fields = ('user__username', 'recipe__name')
+    empty_value_display = 'пусто'
+
+
+admin.site.register(TimelineEntry, TimelineEntryAdmin)
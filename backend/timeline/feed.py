@@ -0,0 +1,148 @@
+"""Лента новых рецептов авторов, на которых подписан пользователь.
+
+Рецепт автора с небольшим числом подписчиков при публикации копируется
+во входящие TimelineEntry всех подписчиков (fan-out on write). Рецепты
+авторов, у которых подписчиков больше TIMELINE_FANOUT_LIMIT, никуда
+не копируются и подмешиваются при чтении (fan-out on read). Поэтому
+страница ленты собирается из входящих и не больше чем страницы рецептов
+каждого популярного автора из подписок, а публикация стоит не больше
+TIMELINE_FANOUT_LIMIT вставок.
+"""
+import heapq
+
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from recipes.models import Recipe
+from users.models import CustomUser, FollowUser
+
+from .models import TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def is_fanned_out(author_id):
+    followers_count = CustomUser.objects.values_list(
+        'followers_count', flat=True).get(pk=author_id)
+    return followers_count <= settings.TIMELINE_FANOUT_LIMIT
+
+
+def push_recipe(recipe):
+    """Добавляет новый рецепт во входящие подписчиков автора."""
+    if not is_fanned_out(recipe.author_id):
+        return
+    followers = FollowUser.objects.filter(
+        author_id=recipe.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, recipe=recipe, date=recipe.date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author(user_id, author_id):
+    """Заполняет входящие последними рецептами нового автора подписки."""
+    if not is_fanned_out(author_id):
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-date', '-id').values_list('id', 'date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, recipe_id=recipe_id, date=date)
+         for recipe_id, date in recipes[:settings.TIMELINE_INBOX_SIZE]),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id).delete()
+
+
+def get_position_filter(position, pk_field):
+    """Условие «строго после position» для порядка (-date, -pk)."""
+    date, pk = position
+    return Q(date__lt=date) | Q(date=date, **{f'{pk_field}__lt': pk})
+
+
+def get_pulled_recipes(user, limit, position=None):
+    """Первые limit рецептов популярных авторов из подписок user.
+
+    Общая сортировка по дате перебрала бы все подходящие рецепты всех
+    популярных авторов, поэтому у каждого автора индексом берутся только
+    его первые limit рецептов, а UNION ALL ограничивает итог до limit.
+    """
+    author_ids = list(FollowUser.objects.filter(
+        user=user,
+        author__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+    if not author_ids:
+        return []
+    queries = []
+    for author_id in author_ids:
+        recipes = Recipe.objects.filter(author_id=author_id)
+        if position is not None:
+            recipes = recipes.filter(get_position_filter(position, 'id'))
+        queries.append(recipes.order_by('-date', '-id').values_list(
+            'date', 'id')[:limit])
+    if len(queries) == 1:
+        return queries[0]
+    return queries[0].union(*queries[1:], all=True).order_by(
+        '-date', '-id')[:limit]
+
+
+def read_timeline(user, limit, position=None):
+    """Первые limit пар (дата, id рецепта) ленты после position.
+
+    Входящие и рецепты популярных авторов уже упорядочены индексами,
+    поэтому они сливаются без сортировки. Рецепт может оказаться
+    в обоих источниках, если автор стал популярным после публикации.
+    Рецепты автора, переставшего быть популярным, возвращает во входящие
+    trim_timelines --rebuild.
+    """
+    inbox = TimelineEntry.objects.filter(user=user).order_by(
+        '-date', '-recipe_id').values_list('date', 'recipe_id')
+    if position is not None:
+        inbox = inbox.filter(get_position_filter(position, 'recipe_id'))
+    entries, seen = [], set()
+    for date, recipe_id in heapq.merge(
+            inbox[:limit], get_pulled_recipes(user, limit, position),
+            reverse=True):
+        if recipe_id not in seen:
+            seen.add(recipe_id)
+            entries.append((date, recipe_id))
+        if len(entries) == limit:
+            break
+    return entries
+
+
+def trim_inboxes():
+    """Оставляет во входящих не больше TIMELINE_INBOX_SIZE записей.
+
+    Возвращает число удалённых записей.
+    """
+    ranked = TimelineEntry.objects.annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('user_id'),
+            order_by=(F('date').desc(), F('recipe_id').desc()),
+        )
+    ).values('id', 'row_number')
+    sql, params = ranked.query.sql_with_params()
+    deleted, _ = TimelineEntry.objects.filter(id__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) ranked '
+        'WHERE ranked.row_number > %s',
+        (*params, settings.TIMELINE_INBOX_SIZE),
+    )).delete()
+    return deleted
+
+
+def rebuild_inboxes():
+    """Заполняет входящие по всем подпискам, например после миграции."""
+    follows = FollowUser.objects.order_by('id').values_list(
+        'user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        add_author(user_id, author_id)
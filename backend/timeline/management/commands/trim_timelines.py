@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from timeline.feed import rebuild_inboxes, trim_inboxes
+
+
+class Command(BaseCommand):
+    help = 'Обрезает входящие ленты подписок до TIMELINE_INBOX_SIZE записей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='refill inboxes from all subscriptions before trimming',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild_inboxes()
+        deleted = trim_inboxes()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей: {deleted}.'
+        ))
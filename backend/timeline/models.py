@@ -0,0 +1,41 @@
+from django.db import models
+from users.models import CustomUser
+from recipes.models import Recipe
+
+
+class TimelineEntry(models.Model):
+    """ Рецепт автора во входящей ленте подписчика. """
+    user = models.ForeignKey(
+        CustomUser,
+        verbose_name='Подписчик',
+        related_name='timeline',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='timeline_entries',
+        on_delete=models.CASCADE
+    )
+    date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'), name='unique_timeline_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-date', '-recipe'),
+                name='timeline_user_date_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user} - {self.recipe}'
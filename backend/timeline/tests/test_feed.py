@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from recipes.models import Recipe
+from timeline.feed import push_recipe, read_timeline
+from timeline.models import TimelineEntry
+from users.models import CustomUser, FollowUser
+
+
+@override_settings(TIMELINE_FANOUT_LIMIT=1)
+class ReadTimelineTest(TestCase):
+    """Лента из входящих и рецептов популярных авторов.
+
+    При TIMELINE_FANOUT_LIMIT=1 авторы с двумя подписчиками популярные
+    и подмешиваются при чтении, а с одним - копируются во входящие.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = cls.create_user('reader')
+        other = cls.create_user('other')
+        start = timezone.now() - timedelta(days=1)
+        cls.recipes = {}
+        for index, name in enumerate(('small', 'star', 'celebrity')):
+            author = cls.create_user(name)
+            followers = (cls.reader,) if name == 'small' else (
+                cls.reader, other)
+            for user in followers:
+                FollowUser.objects.create(user=user, author=author)
+            author.followers_count = len(followers)
+            author.save(update_fields=('followers_count',))
+            for number in range(5):
+                recipe = Recipe.objects.create(
+                    author=author, name=f'{name} {number}', text='Текст',
+                    cooking_time=10,
+                )
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    date=start + timedelta(minutes=number * 3 + index))
+                recipe.refresh_from_db(fields=('date',))
+                push_recipe(recipe)
+                cls.recipes[recipe.pk] = recipe
+        Recipe.objects.create(
+            author=other, name='Чужой', text='Текст', cooking_time=10)
+
+    @staticmethod
+    def create_user(username):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='pass', first_name=username, last_name=username,
+        )
+
+    def expected(self):
+        return sorted(
+            ((recipe.date, pk) for pk, recipe in self.recipes.items()),
+            reverse=True,
+        )
+
+    def read_all(self, page_size):
+        entries, position = [], None
+        while True:
+            page = read_timeline(self.reader, page_size, position)
+            entries.extend(page)
+            if len(page) < page_size:
+                return entries
+            position = page[-1]
+
+    def test_pages_are_merged_in_order(self):
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(self.read_all(4), self.expected())
+
+    def test_page_costs_three_queries(self):
+        with self.assertNumQueries(3):
+            page = read_timeline(self.reader, 2)
+        self.assertEqual(page, self.expected()[:2])
+
+    def test_recipe_in_both_sources_is_returned_once(self):
+        """Автор стал популярным, когда его рецепты уже во входящих."""
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(user=self.reader, recipe=recipe, date=recipe.date)
+            for recipe in self.recipes.values()
+            if recipe.author.username == 'star'
+        )
+        self.assertEqual(self.read_all(3), self.expected())
@@ -10,6 +10,8 @@ class UsersAdmin(admin.ModelAdmin):
         'last_name',
         'first_name',
         'email',
+        'followers_count',
+        'recipes_count',
     )
     search_fields = ('username', 'first_name', 'last_name', 'email')
     list_filter = ('username', 'email',)
@@ -29,6 +29,16 @@ class CustomUser(AbstractUser):
         verbose_name='Пароль',
         max_length=MAX_LENGHT,
     )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
@@ -48,12 +58,14 @@ class FollowUser(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Автор',
         related_name='follower',
+        db_index=False,
     )
     author = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
         verbose_name='Подписчик',
-        related_name='following'
+        related_name='following',
+        db_index=False,
     )
 
     class Meta:
@@ -67,6 +79,11 @@ class FollowUser(models.Model):
                 name='no_self_follow'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'), name='follow_author_user_idx'
+            ),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 